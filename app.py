@@ -3,23 +3,35 @@ import os
 from pathlib import Path
 
 
-backend_process = subprocess.Popen(
-    ["uvicorn", "backend.app:app", "--host", "0.0.0.0", "--port", "8000"],
-    cwd=Path(__file__).parent,
-)
-
 frontend_dir = Path(__file__).parent / "frontend"
 subprocess.run(["npm", "install"], cwd=frontend_dir, check=True)
 subprocess.run(["npm", "run", "build"], cwd=frontend_dir, check=True)
 
+# The API mounts frontend/dist itself, so one server handles both the UI and
+# /api on the public port.
+PORT = 7860
 
-import http.server
-import socketserver
+# One worker by default: metrics, model queues and the optimized servers
+# live in process memory, so extra workers would each load every model and
+# report only their own slice of traffic.
+num_workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
 
-os.chdir(frontend_dir / "dist")
-PORT = 7860  
+command = [
+    "gunicorn", "backend.app:app",
+    "-k", "backend.workers.UvloopWorker",
+    "-w", str(num_workers),
+    "--bind", f"0.0.0.0:{PORT}",
+    # The connection cap is UvloopWorker's limit_concurrency.
+    "--backlog", "2048",
+]
+env = {**os.environ, "WEB_CONCURRENCY": str(num_workers)}
+if num_workers > 1:
+    # --preload imports backend.app once in the gunicorn master, and the flag
+    # has it load the baseline weights there, so forked workers share those
+    # pages copy-on-write.
+    command.append("--preload")
+    env["ML_BENCH_PRELOAD"] = "1"
 
-Handler = http.server.SimpleHTTPRequestHandler
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
-    print(f"Serving on port {PORT}")
-    httpd.serve_forever()
\ No newline at end of file
+backend_process = subprocess.Popen(command, cwd=Path(__file__).parent, env=env)
+print(f"Serving on port {PORT}")
+backend_process.wait()
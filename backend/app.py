@@ -3,22 +3,27 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
+import os
 import time
 from contextlib import asynccontextmanager
 from enum import Enum
+from pathlib import Path
 from typing import AsyncGenerator
 
+import orjson
+import torch
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
 from .batching.dynamic_batcher import DynamicBatcher
 from .metrics.collector import InferenceMetric, MetricsCollector
 from .metrics.storage import MetricsStorage
 from .metrics.analyzer import generate_comparison_report
+from .models.base_server import GREEDY_PARAMS, SAMPLING_PARAMS
 from .models.pytorch_server import PyTorchServer
 from .models.quantized_server import QuantizedServer
 from .models.torchscript_server import TorchScriptServer
@@ -36,9 +41,29 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 servers: dict[str, object] = {}
 batcher: DynamicBatcher | None = None
+# One request queue + consumer coroutine per model server, so each model
+# sees a single stream of calls instead of racing requests.
+model_queues: dict[str, DynamicBatcher] = {}
 metrics_collector = MetricsCollector()
 metrics_storage = MetricsStorage()
 
+FRONTEND_DIST = Path(__file__).resolve().parent.parent / "frontend" / "dist"
+
+# Max in-flight requests per mode during /api/benchmark.
+BENCHMARK_CONCURRENCY = 8
+
+# Worker processes serving this app; each splits the cores with the rest.
+# Metrics, model queues and lazily loaded servers are per process, so any
+# value above 1 reports per-worker slices of traffic.
+WEB_CONCURRENCY = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+
+# Baseline (used by batcher too) loads in the lifespan.  A multi-worker
+# ``gunicorn --preload`` launch sets ML_BENCH_PRELOAD=1 to load it once in
+# the master instead, so forked workers share the weights copy-on-write.
+baseline_server = PyTorchServer(model_name="gpt2")
+if os.environ.get("ML_BENCH_PRELOAD", "0") == "1":
+    baseline_server.load_model()
+
 
 class OptimizationMode(str, Enum):
     baseline = "baseline"
@@ -63,9 +88,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
 
     logger.info("Loading model servers...")
 
-    # Load baseline first (used by batcher too)
-    baseline = PyTorchServer(model_name="gpt2")
-    baseline.load_model()
+    # Warm up in the serving process, not at import, so no inference
+    # threads exist before a pre-forking server forks its workers.
+    baseline = baseline_server
+    if baseline.model is None:
+        baseline.load_model()
     baseline.warmup(num_runs=2)
     servers["baseline"] = baseline
 
@@ -75,6 +102,19 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     servers["torchscript"] = TorchScriptServer(model_name="gpt2")
     servers["onnx"] = ONNXServer(model_name="gpt2")
 
+    # Each server runs on its own inference thread, in each worker process,
+    # so split the cores between all of them instead of letting every
+    # server claim all of them.
+    num_model_servers = len(servers) * WEB_CONCURRENCY
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // num_model_servers))
+
+    # The queues only serialize requests: batches of one keep every mode's
+    # latencies per request.  Batching is measured by the "batched" mode.
+    for mode, server in servers.items():
+        queue = DynamicBatcher(server=server, max_batch_size=1, max_wait_time_ms=0.0)
+        await queue.start()
+        model_queues[mode] = queue
+
     # Set up dynamic batcher using baseline server
     batcher = DynamicBatcher(server=baseline, max_batch_size=8, max_wait_time_ms=50.0)
     await batcher.start()
@@ -86,6 +126,10 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     # Shutdown
     if batcher:
         await batcher.stop()
+    for queue in model_queues.values():
+        await queue.stop()
+    model_queues.clear()
+    metrics_storage.flush()
     logger.info("Shutdown complete.")
 
 
@@ -113,6 +157,7 @@ class InferenceRequest(BaseModel):
     optimization_mode: OptimizationMode = Field(default=OptimizationMode.baseline)
     model_size: ModelSize = Field(default=ModelSize.small)
     max_new_tokens: int = Field(default=50, ge=1, le=200)
+    do_sample: bool = Field(default=True, description="Sample (default) or decode greedily")
 
 
 class InferenceResponse(BaseModel):
@@ -129,6 +174,9 @@ class BenchmarkRequest(BaseModel):
     num_requests: int = Field(default=10, ge=1, le=100)
     text: str = Field(default="The future of artificial intelligence is")
     max_new_tokens: int = Field(default=50, ge=1, le=200)
+    # Greedy by default: deterministic, and skips the sampling warpers
+    # that otherwise add per-token overhead to every mode's numbers.
+    do_sample: bool = Field(default=False)
 
 
 # ---------------------------------------------------------------------------
@@ -140,7 +188,7 @@ async def health_check():
     return {
         "status": "healthy",
         "loaded_servers": loaded,
-        "total_inferences": metrics_collector.get_recent(1).__len__() > 0,
+        "total_inferences": metrics_collector.count(),
         "timestamp": time.time(),
     }
 
@@ -148,55 +196,12 @@ async def health_check():
 @app.post("/api/inference", response_model=InferenceResponse)
 async def run_inference(request: InferenceRequest):
     """Submit a single inference request."""
-    mode = request.optimization_mode.value
-
-    if mode == "batched":
-        if batcher is None:
-            raise HTTPException(500, "Batcher not initialized")
-        try:
-            result = await batcher.submit(request.text, request.max_new_tokens)
-            _record_metric(mode, result)
-            return InferenceResponse(
-                result=result["output"],
-                latency_ms=round(result["latency_ms"], 2),
-                tokens_per_sec=round(result["tokens_per_sec"], 2),
-                tokens_generated=result["tokens_generated"],
-                memory_mb=round(result["memory_mb"], 2),
-                optimization_mode=mode,
-                model_size=request.model_size.value,
-            )
-        except Exception as e:
-            logger.exception("Batched inference failed")
-            raise HTTPException(500, str(e))
-
-    server = servers.get(mode)
-    if server is None:
-        raise HTTPException(400, f"Unknown optimization mode: {mode}")
-
-    try:
-        result = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: server.predict(request.text, request.max_new_tokens),
-        )
-    except Exception as e:
-        logger.exception("Inference failed for mode %s", mode)
-        raise HTTPException(500, f"Inference failed: {e}")
-
-    _record_metric(mode, {
-        "latency_ms": result.latency_ms,
-        "tokens_per_sec": result.tokens_per_sec,
-        "memory_mb": result.memory_mb,
-        "tokens_generated": result.tokens_generated,
-    })
-
-    return InferenceResponse(
-        result=result.output,
-        latency_ms=round(result.latency_ms, 2),
-        tokens_per_sec=round(result.tokens_per_sec, 2),
-        tokens_generated=result.tokens_generated,
-        memory_mb=round(result.memory_mb, 2),
-        optimization_mode=mode,
-        model_size=request.model_size.value,
+    return await _run_inference_core(
+        request.optimization_mode.value,
+        request.text,
+        request.max_new_tokens,
+        request.model_size.value,
+        SAMPLING_PARAMS if request.do_sample else GREEDY_PARAMS,
     )
 
 
@@ -208,7 +213,7 @@ async def get_metrics():
     return {
         "summaries": summaries,
         "comparison": report,
-        "total_inferences": len(metrics_collector.get_all_metrics()),
+        "total_inferences": metrics_collector.count(),
     }
 
 
@@ -218,8 +223,7 @@ async def stream_metrics():
     async def event_generator() -> AsyncGenerator[str, None]:
         last_count = 0
         while True:
-            all_metrics = metrics_collector.get_all_metrics()
-            current_count = len(all_metrics)
+            current_count = metrics_collector.count()
 
             if current_count > last_count:
                 recent = metrics_collector.get_recent(current_count - last_count)
@@ -229,10 +233,12 @@ async def stream_metrics():
                     "summaries": summaries,
                     "total": current_count,
                 }
-                yield f"data: {json.dumps(data)}\n\n"
+                yield f"data: {orjson.dumps(data).decode()}\n\n"
                 last_count = current_count
-
-            await asyncio.sleep(0.5)
+                # Poll quickly while traffic is flowing, back off when idle.
+                await asyncio.sleep(0.1)
+            else:
+                await asyncio.sleep(1.0)
 
     return StreamingResponse(
         event_generator(),
@@ -251,24 +257,34 @@ async def run_benchmark(request: BenchmarkRequest):
     modes = ["baseline", "quantized", "torchscript", "onnx", "batched"]
     results: dict[str, list[dict]] = {mode: [] for mode in modes}
 
+    semaphore = asyncio.Semaphore(BENCHMARK_CONCURRENCY)
+    inference_params = SAMPLING_PARAMS if request.do_sample else GREEDY_PARAMS
+
+    async def run_one(mode: str) -> dict:
+        async with semaphore:
+            return await _run_inference_core(
+                mode, request.text, request.max_new_tokens, ModelSize.small.value,
+                inference_params,
+            )
+
     for mode in modes:
-        for i in range(request.num_requests):
-            try:
-                req = InferenceRequest(
-                    text=request.text,
-                    optimization_mode=OptimizationMode(mode),
-                    max_new_tokens=request.max_new_tokens,
-                )
-                response = await run_inference(req)
-                results[mode].append({
-                    "iteration": i + 1,
-                    "latency_ms": response.latency_ms,
-                    "tokens_per_sec": response.tokens_per_sec,
-                    "memory_mb": response.memory_mb,
-                })
-            except Exception as e:
-                logger.warning("Benchmark iteration %d failed for %s: %s", i, mode, e)
-                results[mode].append({"iteration": i + 1, "error": str(e)})
+        # Keep requests for one mode in flight together: the server's own
+        # executor still serializes them, and the batcher gets real batches.
+        responses = await asyncio.gather(
+            *(run_one(mode) for _ in range(request.num_requests)),
+            return_exceptions=True,
+        )
+        for i, response in enumerate(responses):
+            if isinstance(response, Exception):
+                logger.warning("Benchmark iteration %d failed for %s: %s", i, mode, response)
+                results[mode].append({"iteration": i + 1, "error": str(response)})
+                continue
+            results[mode].append({
+                "iteration": i + 1,
+                "latency_ms": response["latency_ms"],
+                "tokens_per_sec": response["tokens_per_sec"],
+                "memory_mb": response["memory_mb"],
+            })
 
     summaries = metrics_collector.get_all_summaries()
     return {
@@ -315,6 +331,46 @@ async def get_models():
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
+async def _run_inference_core(
+    mode: str,
+    text: str,
+    max_new_tokens: int,
+    model_size: str,
+    inference_params: dict | None = None,
+) -> dict:
+    """Run one inference and record its metrics.
+
+    Shared by ``/api/inference`` and ``/api/benchmark``; takes plain values
+    so internal callers skip building and validating request models.
+    """
+    if mode == "batched":
+        if batcher is None:
+            raise HTTPException(500, "Batcher not initialized")
+        queue = batcher
+    else:
+        queue = model_queues.get(mode)
+        if queue is None:
+            raise HTTPException(400, f"Unknown optimization mode: {mode}")
+
+    try:
+        result = await queue.submit(text, max_new_tokens, inference_params)
+    except Exception as e:
+        logger.exception("Inference failed for mode %s", mode)
+        raise HTTPException(500, f"Inference failed: {e}")
+
+    _record_metric(mode, result)
+
+    return {
+        "result": result["output"],
+        "latency_ms": round(result["latency_ms"], 2),
+        "tokens_per_sec": round(result["tokens_per_sec"], 2),
+        "tokens_generated": result["tokens_generated"],
+        "memory_mb": round(result["memory_mb"], 2),
+        "optimization_mode": mode,
+        "model_size": model_size,
+    }
+
+
 def _record_metric(mode: str, result: dict) -> None:
     """Record a metric to both the in-memory collector and persistent storage."""
     metric = InferenceMetric(
@@ -325,10 +381,12 @@ def _record_metric(mode: str, result: dict) -> None:
         tokens_generated=result["tokens_generated"],
     )
     metrics_collector.record(metric)
-    metrics_storage.save(
-        optimization_mode=mode,
-        latency_ms=result["latency_ms"],
-        tokens_per_sec=result["tokens_per_sec"],
-        memory_mb=result["memory_mb"],
-        tokens_generated=result["tokens_generated"],
-    )
+    metrics_storage.save(metric)
+
+
+# ---------------------------------------------------------------------------
+# Frontend
+# ---------------------------------------------------------------------------
+# Mounted last so every /api route above takes precedence over the catch-all.
+if FRONTEND_DIST.is_dir():
+    app.mount("/", StaticFiles(directory=str(FRONTEND_DIST), html=True), name="frontend")
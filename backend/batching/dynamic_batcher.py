@@ -3,12 +3,22 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import logging
 import time
 from dataclasses import dataclass, field
 
 logger = logging.getLogger(__name__)
 
+# Upper bounds (estimated input tokens) of the length buckets a batch is
+# split into, so a short prompt is never padded out to a long one.
+LENGTH_BUCKETS = (16, 64, 256)
+
+
+def _length_bucket(text: str) -> int:
+    """Cheap input-length bucket from a whitespace token estimate."""
+    return bisect.bisect_left(LENGTH_BUCKETS, len(text.split()))
+
 
 @dataclass
 class BatchRequest:
@@ -17,13 +27,16 @@ class BatchRequest:
     max_new_tokens: int
     future: asyncio.Future
     submitted_at: float = field(default_factory=time.perf_counter)
+    inference_params: dict | None = None
 
 
 class DynamicBatcher:
     """Collects individual requests and batches them for efficient inference.
 
     Flushes when either the batch reaches max_batch_size or max_wait_time_ms
-    has elapsed since the first request in the current batch.
+    has elapsed since the first request in the current batch.  With
+    ``max_wait_time_ms=0`` it only batches requests that were already queued,
+    which makes it a plain single-consumer request queue for a server.
     """
 
     def __init__(
@@ -58,11 +71,18 @@ class DynamicBatcher:
             except asyncio.CancelledError:
                 pass
 
-    async def submit(self, text: str, max_new_tokens: int = 50) -> dict:
+    async def submit(
+        self, text: str, max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> dict:
         """Submit a request and wait for the batched result."""
         loop = asyncio.get_event_loop()
         future = loop.create_future()
-        request = BatchRequest(text=text, max_new_tokens=max_new_tokens, future=future)
+        request = BatchRequest(
+            text=text,
+            max_new_tokens=max_new_tokens,
+            future=future,
+            inference_params=inference_params,
+        )
         await self._queue.put(request)
         return await future
 
@@ -81,6 +101,12 @@ class DynamicBatcher:
             # Collect more requests until batch is full or timeout
             deadline = time.perf_counter() + self.max_wait_time_ms / 1000.0
             while len(batch) < self.max_batch_size:
+                # Take anything already queued before waiting for stragglers.
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
                 remaining = deadline - time.perf_counter()
                 if remaining <= 0:
                     break
@@ -94,28 +120,42 @@ class DynamicBatcher:
             await self._process_batch(batch)
 
     async def _process_batch(self, batch: list[BatchRequest]) -> None:
-        """Process a batch of requests by running inference on each.
+        """Process a batch of requests with one batched predict call.
 
-        For true batch inference, the model server would need a batch predict
-        method. Here we run individual predictions but measure the batching
-        overhead to demonstrate the batching infrastructure.
+        Requests are grouped by ``max_new_tokens``, ``inference_params`` and
+        input-length bucket so each group shares a single ``generate()`` call
+        with little padding, then results are fanned back out to the waiting
+        futures.
         """
         logger.debug("Processing batch of %d requests", len(batch))
 
+        groups: dict[tuple, list[BatchRequest]] = {}
         for req in batch:
+            params = req.inference_params
+            params_key = tuple(sorted(params.items())) if params else ()
+            key = (req.max_new_tokens, params_key, _length_bucket(req.text))
+            groups.setdefault(key, []).append(req)
+
+        for (max_new_tokens, _, _), group in groups.items():
+            texts = [req.text for req in group]
             try:
-                result = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda t=req.text, n=req.max_new_tokens: self.server.predict(t, n),
+                results = await self.server.apredict_batch(
+                    texts, max_new_tokens, group[0].inference_params,
                 )
+            except Exception as e:
+                for req in group:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+                continue
+
+            for req, result in zip(group, results):
+                if req.future.done():
+                    continue
                 req.future.set_result({
                     "output": result.output,
                     "latency_ms": result.latency_ms,
                     "tokens_per_sec": result.tokens_per_sec,
                     "memory_mb": result.memory_mb,
                     "tokens_generated": result.tokens_generated,
-                    "batch_size": len(batch),
+                    "batch_size": len(group),
                 })
-            except Exception as e:
-                if not req.future.done():
-                    req.future.set_exception(e)
@@ -14,15 +14,16 @@ def compute_percentiles(values: list[float], percentiles: list[int] | None = Non
         return {}
     if percentiles is None:
         percentiles = [50, 90, 95, 99]
-    arr = np.array(values)
+    arr = np.asarray(values, dtype=np.float64)
     result = {
-        "mean": float(np.mean(arr)),
-        "std": float(np.std(arr)),
-        "min": float(np.min(arr)),
-        "max": float(np.max(arr)),
+        "mean": float(arr.mean()),
+        "std": float(arr.std()),
+        "min": float(arr.min()),
+        "max": float(arr.max()),
     }
-    for p in percentiles:
-        result[f"p{p}"] = float(np.percentile(arr, p))
+    # One call partitions the array once for every requested percentile.
+    for p, value in zip(percentiles, np.percentile(arr, percentiles)):
+        result[f"p{p}"] = float(value)
     return result
 
 
@@ -4,12 +4,14 @@ from __future__ import annotations
 
 import time
 import threading
+from collections import deque
+from itertools import islice
 from dataclasses import dataclass, field
 
 import numpy as np
 
 
-@dataclass
+@dataclass(slots=True)
 class InferenceMetric:
     """A single recorded inference measurement."""
     optimization_mode: str
@@ -19,33 +21,122 @@ class InferenceMetric:
     tokens_generated: int
     timestamp: float = field(default_factory=time.time)
 
+    def _asdict_fast(self) -> dict:
+        """Wire format for the SSE stream; values are left unrounded."""
+        return {
+            "mode": self.optimization_mode,
+            "latency_ms": self.latency_ms,
+            "tokens_per_sec": self.tokens_per_sec,
+            "memory_mb": self.memory_mb,
+            "tokens_generated": self.tokens_generated,
+            "timestamp": self.timestamp,
+        }
+
+
+class _ModeBuffer:
+    """Preallocated ring buffers holding one mode's recent measurements.
+
+    The live entries are the ``count`` slots ending just before ``index``;
+    the collector drops them oldest-first as its global history evicts.
+    """
+
+    def __init__(self, capacity: int):
+        self.latency = np.empty(capacity, dtype=np.float64)
+        self.throughput = np.empty(capacity, dtype=np.float64)
+        self.memory = np.empty(capacity, dtype=np.float64)
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.index = 0
+        self.count = 0
+        self.version = 0
+
+    def append(self, metric: InferenceMetric) -> None:
+        i = self.index
+        self.latency[i] = metric.latency_ms
+        self.throughput[i] = metric.tokens_per_sec
+        self.memory[i] = metric.memory_mb
+        self.timestamp[i] = metric.timestamp
+        self.index = (i + 1) % len(self.latency)
+        self.count = min(self.count + 1, len(self.latency))
+        self.version += 1
+
+    def drop_oldest(self) -> None:
+        self.count -= 1
+        self.version += 1
+
+    def window(self, values: np.ndarray) -> np.ndarray:
+        """Copy of the live entries of ``values``, oldest first."""
+        start = (self.index - self.count) % len(values)
+        if start + self.count <= len(values):
+            return values[start:start + self.count].copy()
+        return np.concatenate((values[start:], values[:self.index]))
+
 
 class MetricsCollector:
     """Thread-safe collector that records inference metrics and computes aggregates."""
 
     def __init__(self, max_history: int = 10_000):
-        self._metrics: list[InferenceMetric] = []
+        # A bounded deque evicts the oldest metric in O(1) on append.
+        self._metrics: deque[InferenceMetric] = deque(maxlen=max_history)
+        # Per-mode ring buffers so summaries never filter the full history.
+        # They cover the same window as the deque: each eviction from it
+        # also drops the oldest entry of that metric's mode.
+        self._by_mode: dict[str, _ModeBuffer] = {}
+        # mode -> (buffer version, summary); reused until the mode records again.
+        self._summary_cache: dict[str, tuple[int, dict]] = {}
+        self._total = 0
         self._lock = threading.Lock()
         self._max_history = max_history
 
     def record(self, metric: InferenceMetric) -> None:
         with self._lock:
+            if len(self._metrics) == self._max_history:
+                evicted = self._metrics[0].optimization_mode
+                old = self._by_mode[evicted]
+                old.drop_oldest()
+                if not old.count:
+                    del self._by_mode[evicted]
+                    self._summary_cache.pop(evicted, None)
             self._metrics.append(metric)
-            if len(self._metrics) > self._max_history:
-                self._metrics = self._metrics[-self._max_history:]
+            self._total += 1
+            buf = self._by_mode.get(metric.optimization_mode)
+            if buf is None:
+                buf = self._by_mode[metric.optimization_mode] = _ModeBuffer(self._max_history)
+            buf.append(metric)
 
     def get_metrics_by_mode(self, mode: str) -> list[InferenceMetric]:
         with self._lock:
             return [m for m in self._metrics if m.optimization_mode == mode]
 
+    def count(self) -> int:
+        """Total metrics recorded, including ones evicted from history."""
+        with self._lock:
+            return self._total
+
     def get_all_metrics(self) -> list[InferenceMetric]:
         with self._lock:
             return list(self._metrics)
 
     def get_summary(self, mode: str) -> dict:
-        """Compute aggregate statistics for a given optimization mode."""
-        metrics = self.get_metrics_by_mode(mode)
-        if not metrics:
+        """Compute aggregate statistics for a given optimization mode.
+
+        Summaries are cached per mode and only recomputed after that mode
+        records a new metric, so callers must not mutate the returned dict.
+        """
+        with self._lock:
+            buf = self._by_mode.get(mode)
+            count = buf.count if buf is not None else 0
+            if count:
+                version = buf.version
+                cached = self._summary_cache.get(mode)
+                if cached is not None and cached[0] == version:
+                    return cached[1]
+                latencies = buf.window(buf.latency)
+                throughputs = buf.window(buf.throughput)
+                memories = buf.window(buf.memory)
+                oldest = buf.timestamp[(buf.index - count) % len(buf.timestamp)]
+                newest = buf.timestamp[buf.index - 1]
+
+        if not count:
             return {
                 "mode": mode,
                 "count": 0,
@@ -54,59 +145,57 @@ class MetricsCollector:
                 "memory": {},
             }
 
-        latencies = np.array([m.latency_ms for m in metrics])
-        throughputs = np.array([m.tokens_per_sec for m in metrics])
-        memories = np.array([m.memory_mb for m in metrics])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
 
-        return {
+        summary = {
             "mode": mode,
-            "count": len(metrics),
+            "count": count,
             "latency": {
-                "mean": float(np.mean(latencies)),
-                "p50": float(np.percentile(latencies, 50)),
-                "p95": float(np.percentile(latencies, 95)),
-                "p99": float(np.percentile(latencies, 99)),
-                "min": float(np.min(latencies)),
-                "max": float(np.max(latencies)),
+                "mean": float(latencies.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99),
+                "min": float(latencies.min()),
+                "max": float(latencies.max()),
             },
             "throughput": {
-                "mean_tokens_per_sec": float(np.mean(throughputs)),
-                "max_tokens_per_sec": float(np.max(throughputs)),
-                "requests_per_sec": len(metrics) / max(
-                    metrics[-1].timestamp - metrics[0].timestamp, 0.001
-                ) if len(metrics) > 1 else 0.0,
+                "mean_tokens_per_sec": float(throughputs.mean()),
+                "max_tokens_per_sec": float(throughputs.max()),
+                "requests_per_sec": count / max(
+                    float(newest - oldest), 0.001
+                ) if count > 1 else 0.0,
             },
             "memory": {
-                "mean_mb": float(np.mean(memories)),
-                "peak_mb": float(np.max(memories)),
+                "mean_mb": float(memories.mean()),
+                "peak_mb": float(memories.max()),
             },
         }
+        with self._lock:
+            # Skip the store if clear() dropped this mode while we computed.
+            if self._by_mode.get(mode) is buf:
+                self._summary_cache[mode] = (version, summary)
+        return summary
 
     def get_all_summaries(self) -> dict:
         """Get summaries for all optimization modes."""
-        modes = set()
         with self._lock:
-            for m in self._metrics:
-                modes.add(m.optimization_mode)
+            modes = list(self._by_mode)
 
         return {mode: self.get_summary(mode) for mode in sorted(modes)}
 
     def get_recent(self, n: int = 50) -> list[dict]:
-        """Get the most recent n metrics as dicts for SSE streaming."""
+        """Get the most recent n metrics as dicts for SSE streaming.
+
+        Values are not rounded; the frontend formats them for display.
+        """
         with self._lock:
-            recent = self._metrics[-n:]
-        return [
-            {
-                "mode": m.optimization_mode,
-                "latency_ms": round(m.latency_ms, 2),
-                "tokens_per_sec": round(m.tokens_per_sec, 2),
-                "memory_mb": round(m.memory_mb, 2),
-                "tokens_generated": m.tokens_generated,
-                "timestamp": m.timestamp,
-            }
-            for m in recent
-        ]
+            # Walk in from the tail so the cost scales with n, not history.
+            recent = list(islice(reversed(self._metrics), n))
+        return [m._asdict_fast() for m in reversed(recent)]
 
     def clear(self) -> None:
         with self._lock:
             self._metrics.clear()
+            self._by_mode.clear()
+            self._summary_cache.clear()
+            self._total = 0
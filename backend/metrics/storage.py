@@ -2,79 +2,191 @@
 
 from __future__ import annotations
 
+import logging
+import os
+import queue
 import sqlite3
 import threading
 import time
 from pathlib import Path
 
+from .collector import InferenceMetric
+
+logger = logging.getLogger(__name__)
+
 DB_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "metrics.db"
 
+# The background writer commits once per batch instead of once per row.
+WRITE_BATCH_SIZE = 100
+WRITE_INTERVAL_S = 0.5
+
+_STOP = object()
+
+_HISTORY_SELECT = (
+    "SELECT optimization_mode, latency_ms, tokens_per_sec, memory_mb, "
+    "tokens_generated, timestamp FROM metrics"
+)
+
+
+def _to_row(metric: InferenceMetric) -> tuple:
+    return (
+        metric.optimization_mode,
+        metric.latency_ms,
+        metric.tokens_per_sec,
+        metric.memory_mb,
+        metric.tokens_generated,
+        metric.timestamp,
+    )
+
 
 class MetricsStorage:
-    """Persists inference metrics to SQLite for historical analysis."""
+    """Persists inference metrics to SQLite for historical analysis.
+
+    Writes are queued and committed in batches by a background thread, so
+    ``save`` never waits on disk.  Rows become visible to readers within
+    ``WRITE_INTERVAL_S``; call ``flush`` to wait for pending writes.
+    """
 
     def __init__(self, db_path: Path = DB_PATH):
         self._db_path = db_path
         self._db_path.parent.mkdir(parents=True, exist_ok=True)
         self._local = threading.local()
         self._init_db()
+        self._start_writer()
+
+    def _start_writer(self) -> None:
+        # Threads do not survive fork(), so each process (e.g. every
+        # pre-forked gunicorn worker) starts its own writer.
+        self._pid = os.getpid()
+        self._write_q: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="metrics-writer", daemon=True,
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self._db_path))
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
 
     def _get_conn(self) -> sqlite3.Connection:
+        """Per-thread read-only connection."""
         if not hasattr(self._local, "conn") or self._local.conn is None:
-            self._local.conn = sqlite3.connect(str(self._db_path))
-            self._local.conn.row_factory = sqlite3.Row
+            self._local.conn = self._connect()
+            self._local.conn.execute("PRAGMA query_only=1")
         return self._local.conn
 
     def _init_db(self) -> None:
-        conn = self._get_conn()
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                optimization_mode TEXT NOT NULL,
-                latency_ms REAL NOT NULL,
-                tokens_per_sec REAL NOT NULL,
-                memory_mb REAL NOT NULL,
-                tokens_generated INTEGER NOT NULL,
-                timestamp REAL NOT NULL
-            )
-        """)
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_mode ON metrics(optimization_mode)
-        """)
-        conn.commit()
-
-    def save(
-        self,
-        optimization_mode: str,
-        latency_ms: float,
-        tokens_per_sec: float,
-        memory_mb: float,
-        tokens_generated: int,
-    ) -> None:
-        conn = self._get_conn()
-        conn.execute(
-            """INSERT INTO metrics
-               (optimization_mode, latency_ms, tokens_per_sec, memory_mb, tokens_generated, timestamp)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (optimization_mode, latency_ms, tokens_per_sec, memory_mb, tokens_generated, time.time()),
-        )
-        conn.commit()
+        conn = self._connect()
+        try:
+            # WAL lets readers proceed while the writer thread commits.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    optimization_mode TEXT NOT NULL,
+                    latency_ms REAL NOT NULL,
+                    tokens_per_sec REAL NOT NULL,
+                    memory_mb REAL NOT NULL,
+                    tokens_generated INTEGER NOT NULL,
+                    timestamp REAL NOT NULL
+                )
+            """)
+            # Serves the per-mode history query as a range scan with no sort.
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_mode_ts
+                ON metrics(optimization_mode, timestamp DESC)
+            """)
+            conn.execute("DROP INDEX IF EXISTS idx_mode")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save(self, metric: InferenceMetric) -> None:
+        if self._pid != os.getpid():
+            self._start_writer()
+        self._write_q.put_nowait(metric)
+
+    def flush(self) -> None:
+        """Block until every queued row has been committed."""
+        if self._pid == os.getpid():
+            self._write_q.join()
+
+    def close(self) -> None:
+        """Commit pending rows and stop the writer thread."""
+        if self._pid == os.getpid() and self._writer.is_alive():
+            self._write_q.put(_STOP)
+            self._writer.join()
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            item = self._write_q.get()
+            taken = 1
+            rows = []
+            if item is _STOP:
+                stopping = True
+            else:
+                rows.append(_to_row(item))
+
+            deadline = time.monotonic() + WRITE_INTERVAL_S
+            while not stopping and len(rows) < WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._write_q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stopping = True
+                else:
+                    rows.append(_to_row(item))
+
+            try:
+                if rows:
+                    conn.executemany(
+                        """INSERT INTO metrics
+                           (optimization_mode, latency_ms, tokens_per_sec, memory_mb, tokens_generated, timestamp)
+                           VALUES (?, ?, ?, ?, ?, ?)""",
+                        rows,
+                    )
+                    conn.commit()
+            except sqlite3.Error:
+                logger.exception("Failed to persist %d metrics", len(rows))
+            finally:
+                for _ in range(taken):
+                    self._write_q.task_done()
+        conn.close()
 
     def get_history(self, mode: str | None = None, limit: int = 1000) -> list[dict]:
         conn = self._get_conn()
         if mode:
             rows = conn.execute(
-                "SELECT * FROM metrics WHERE optimization_mode = ? ORDER BY timestamp DESC LIMIT ?",
+                f"{_HISTORY_SELECT} WHERE optimization_mode = ? ORDER BY timestamp DESC LIMIT ?",
                 (mode, limit),
             ).fetchall()
         else:
             rows = conn.execute(
-                "SELECT * FROM metrics ORDER BY timestamp DESC LIMIT ?",
+                f"{_HISTORY_SELECT} ORDER BY timestamp DESC LIMIT ?",
                 (limit,),
             ).fetchall()
-        return [dict(r) for r in rows]
+        return [
+            {
+                "optimization_mode": r[0],
+                "latency_ms": r[1],
+                "tokens_per_sec": r[2],
+                "memory_mb": r[3],
+                "tokens_generated": r[4],
+                "timestamp": r[5],
+            }
+            for r in rows
+        ]
 
     def get_total_count(self) -> int:
         conn = self._get_conn()
-        row = conn.execute("SELECT COUNT(*) as cnt FROM metrics").fetchone()
-        return row["cnt"]
+        row = conn.execute("SELECT COUNT(*) FROM metrics").fetchone()
+        return row[0]
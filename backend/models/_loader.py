@@ -0,0 +1,71 @@
+"""Process-wide cache of pretrained tokenizers and models.
+
+Every optimization mode starts from the same checkpoint, so the weights
+and tokenizer files are read and parsed once per process instead of once
+per server.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+import threading
+
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers.utils import is_accelerate_available
+
+logger = logging.getLogger(__name__)
+
+# Servers load lazily from their own executor threads; one lock keeps two
+# of them from loading the same checkpoint at the same time.
+_lock = threading.Lock()
+
+# Build the model on the meta device and materialize it straight from the
+# checkpoint, skipping a random-init pass over every weight.  transformers
+# 4.x needs accelerate for this; 5.x always loads this way.
+_FAST_INIT = {"low_cpu_mem_usage": True} if is_accelerate_available() else {}
+_tokenizers: dict[tuple[str, str | None], object] = {}
+_models: dict[tuple[str, str | None], object] = {}
+
+
+def load_tokenizer(model_name: str, *, revision: str | None = None):
+    """Return a tokenizer for ``model_name`` at ``revision``, parsed at most once.
+
+    Each caller gets its own copy: fast tokenizers reconfigure truncation
+    and padding on every call, so one instance is not safe to use from
+    several servers' threads at once.
+    """
+    with _lock:
+        tokenizer = _tokenizers.get((model_name, revision))
+        if tokenizer is None:
+            # Rust-backed tokenizers encode and decode several times faster.
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name, revision=revision, use_fast=True,
+            )
+            _tokenizers[model_name, revision] = tokenizer
+    return copy.deepcopy(tokenizer)
+
+
+def load_causal_lm(
+    model_name: str, *, revision: str | None = None, private: bool = False,
+):
+    """Return the eval-mode causal LM for ``model_name``, loaded at most once.
+
+    A pinned ``revision`` (ideally a commit hash) keeps the hub from
+    resolving the files to new ones, and a redownload, when a branch moves.
+
+    The shared instance must be treated as read-only.  Callers that move,
+    compile, or rewrite the model pass ``private=True`` to get a deep copy.
+    """
+    with _lock:
+        model = _models.get((model_name, revision))
+        if model is None:
+            logger.info("Loading pretrained weights: %s", model_name)
+            # safetensors files, where the repo has them, are preferred by
+            # default and memory-mapped instead of unpickled.
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name, revision=revision, **_FAST_INIT,
+            )
+            model.eval()
+            _models[model_name, revision] = model
+    return copy.deepcopy(model) if private else model
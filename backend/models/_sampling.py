@@ -0,0 +1,101 @@
+"""Top-k sampling for the ONNX decode loop.
+
+With ``numba`` installed, top-k selection, temperature, softmax and the
+draw run as one compiled pass over the logits instead of a chain of
+numpy ops that each allocate and traverse a vocab-sized temporary.
+Without it, an equivalent numpy implementation is used.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # optional dependency
+    njit = None
+
+
+def _sample_next_numpy(logits: np.ndarray, top_k: int, temperature: float) -> int:
+    top_k_indices = np.argpartition(logits, -top_k)[-top_k:]
+    top_k_logits = logits[top_k_indices] / temperature
+
+    top_k_logits -= top_k_logits.max()  # numerical stability
+    weights = np.exp(top_k_logits)
+
+    # Inverse-CDF draw; scaling u by the total skips normalizing, and
+    # searchsorted skips np.random.choice's validation of ``p``.
+    cdf = np.cumsum(weights)
+    chosen = int(np.searchsorted(cdf, np.random.random() * cdf[-1], side="right"))
+    return int(top_k_indices[min(chosen, top_k - 1)])
+
+
+def _sample_next_kernel(logits, top_k, temperature):
+    # Size-k min-heap over one scan of the logits: the root is the
+    # smallest of the k best seen so far.
+    heap_vals = np.empty(top_k, dtype=np.float64)
+    heap_idx = np.empty(top_k, dtype=np.int64)
+    size = 0
+    for i in range(logits.shape[0]):
+        v = logits[i]
+        if size < top_k:
+            # Sift up.
+            pos = size
+            size += 1
+            while pos > 0:
+                parent = (pos - 1) >> 1
+                if heap_vals[parent] <= v:
+                    break
+                heap_vals[pos] = heap_vals[parent]
+                heap_idx[pos] = heap_idx[parent]
+                pos = parent
+            heap_vals[pos] = v
+            heap_idx[pos] = i
+        elif v > heap_vals[0]:
+            # Replace the root and sift down.
+            pos = 0
+            while True:
+                child = 2 * pos + 1
+                if child >= top_k:
+                    break
+                if child + 1 < top_k and heap_vals[child + 1] < heap_vals[child]:
+                    child += 1
+                if heap_vals[child] >= v:
+                    break
+                heap_vals[pos] = heap_vals[child]
+                heap_idx[pos] = heap_idx[child]
+                pos = child
+            heap_vals[pos] = v
+            heap_idx[pos] = i
+
+    best = heap_vals[0]
+    for j in range(1, size):
+        if heap_vals[j] > best:
+            best = heap_vals[j]
+
+    total = 0.0
+    for j in range(size):
+        heap_vals[j] = np.exp((heap_vals[j] - best) / temperature)
+        total += heap_vals[j]
+
+    # Inverse-CDF draw over the k weights.
+    target = np.random.random() * total
+    for j in range(size):
+        target -= heap_vals[j]
+        if target < 0.0:
+            return heap_idx[j]
+    return heap_idx[size - 1]
+
+
+if njit is not None:
+    _sample_next_jit = njit(cache=True, fastmath=True)(_sample_next_kernel)
+
+    def sample_next(logits: np.ndarray, top_k: int, temperature: float) -> int:
+        """Draw a token id from the top ``top_k`` of ``logits`` at ``temperature``.
+
+        Note that numba keeps its own RNG state, separate from
+        ``np.random.seed``.
+        """
+        return int(_sample_next_jit(logits, top_k, temperature))
+else:
+    sample_next = _sample_next_numpy
@@ -2,26 +2,65 @@
 
 from __future__ import annotations
 
+import asyncio
+import os
 import time
 import logging
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Any
 
 import torch
 import psutil
+from torch.ao.nn.quantized.dynamic import Linear as DynamicQuantizedLinear
 
 logger = logging.getLogger(__name__)
 
+# RSS barely moves between back-to-back inferences, so reuse a sample for
+# this long instead of reading /proc on every predict().
+MEMORY_SAMPLE_TTL_S = 0.25
 
-@dataclass
+# (monotonic time, rss in MB) of the last process memory sample.
+_last_mem_sample = (float("-inf"), 0.0)
+
+# Decoded prompts kept per server; benchmarks repeat the same prompt.
+PROMPT_DECODE_CACHE_SIZE = 256
+
+# Default sampling for the generate()-based servers.
+SAMPLING_PARAMS = {"do_sample": True, "temperature": 0.8, "top_p": 0.9, "top_k": 50}
+
+# Deterministic decoding: skips the per-step top-k/top-p warpers entirely.
+GREEDY_PARAMS = {"do_sample": False, "num_beams": 1}
+
+
+def generation_params(inference_params: dict | None, defaults: dict = SAMPLING_PARAMS) -> dict:
+    """Merge per-request ``generate()`` overrides onto a server's defaults.
+
+    With sampling off, the sampling knobs are dropped so ``generate()``
+    neither builds warpers for them nor warns that they are unused.
+    """
+    params = {**defaults, **(inference_params or {})}
+    if not params.get("do_sample", False):
+        for key in ("temperature", "top_p", "top_k"):
+            params.pop(key, None)
+    return params
+
+
+@dataclass(slots=True)
 class InferenceResult:
     """Result from a single inference call."""
     output: str
     latency_ms: float
     tokens_generated: int
     memory_mb: float
-    tokens_per_sec: float
+
+    @property
+    def tokens_per_sec(self) -> float:
+        # Derived on read, so results nobody asks throughput of skip it.
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.tokens_generated * 1000 / self.latency_ms
 
 
 @dataclass
@@ -42,13 +81,32 @@ class BaseModelServer(ABC):
     latency measurement, and a uniform predict interface.
     """
 
-    def __init__(self, model_name: str, optimization_mode: str, device: str | None = None):
+    # Shared handle for the current process; psutil.Process() stats /proc.
+    _process: psutil.Process | None = None
+
+    def __init__(
+        self,
+        model_name: str,
+        optimization_mode: str,
+        device: str | None = None,
+        revision: str | None = None,
+    ):
         self.model_name = model_name
+        # Hub branch, tag or commit to load; None follows the default branch.
+        self.revision = revision
         self.optimization_mode = optimization_mode
         self.device = self._resolve_device(device)
         self.model = None
         self.tokenizer = None
         self._loaded = False
+        self._model_info: ModelInfo | None = None
+        self._model_info_source = None
+        self._prompt_decode_cache: dict[tuple[int, ...], str] = {}
+        # One worker thread per server: concurrent generate() calls on the
+        # same model only fight over the GIL and torch's intra-op threads.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"infer-{optimization_mode}",
+        )
         logger.info(
             "Initializing %s server for %s on %s",
             optimization_mode, model_name, self.device,
@@ -69,57 +127,173 @@ class BaseModelServer(ABC):
         """Load and prepare the model for inference."""
 
     @abstractmethod
-    def _run_inference(self, text: str, max_new_tokens: int = 50) -> tuple[str, int]:
+    def _run_inference(
+        self, text: str, max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> tuple[str, int]:
         """Execute model-specific inference.
 
+        ``inference_params`` overrides the server's ``generate()`` settings,
+        e.g. ``GREEDY_PARAMS``.
+
         Returns:
             Tuple of (generated_text, token_count).
         """
 
-    def predict(self, text: str, max_new_tokens: int = 50) -> InferenceResult:
-        """Run inference with full instrumentation.
+    def _run_batch_inference(
+        self, texts: list[str], max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> list[tuple[str, int]]:
+        """Execute inference over a batch of prompts.
 
-        Measures latency, memory, and throughput automatically.
+        The default runs each prompt sequentially; servers that can batch
+        a forward pass override this.
+
+        Returns:
+            One (generated_text, token_count) tuple per prompt, in order.
         """
+        return [
+            self._run_inference(text, max_new_tokens, inference_params) for text in texts
+        ]
+
+    def _decode_prompt(self, prompt_ids) -> str:
+        """Decode prompt token ids, reusing the text for repeated prompts."""
+        key = tuple(prompt_ids)
+        text = self._prompt_decode_cache.get(key)
+        if text is None:
+            text = self.tokenizer.decode(key, skip_special_tokens=True)
+            if len(self._prompt_decode_cache) >= PROMPT_DECODE_CACHE_SIZE:
+                # Dicts iterate in insertion order: drop the oldest entry.
+                del self._prompt_decode_cache[next(iter(self._prompt_decode_cache))]
+            self._prompt_decode_cache[key] = text
+        return text
+
+    def _ensure_loaded(self) -> None:
         if not self._loaded:
-            self.load_model()
+            # Callers may already have run load_model() directly (e.g. the
+            # app preloads baseline at import); don't load a second copy.
+            if self.model is None:
+                self.load_model()
             self._loaded = True
 
-        start = time.perf_counter()
+    def _predict_raw(
+        self, text: str, max_new_tokens: int, inference_params: dict | None = None,
+    ) -> tuple[str, int, int]:
+        """Executor-side half of predict: run and time the model only.
 
-        output_text, token_count = self._run_inference(text, max_new_tokens)
+        Returns:
+            Tuple of (generated_text, token_count, elapsed_ns).
+        """
+        self._ensure_loaded()
 
-        elapsed = time.perf_counter() - start
-        latency_ms = elapsed * 1000
-        tokens_per_sec = token_count / elapsed if elapsed > 0 else 0.0
+        start = time.perf_counter_ns()
+        # inference_mode also skips autograd version counters and view
+        # tracking, which no_grad alone still maintains.
+        with torch.inference_mode():
+            output_text, token_count = self._run_inference(
+                text, max_new_tokens, inference_params,
+            )
+        return output_text, token_count, time.perf_counter_ns() - start
 
-        # Report absolute memory usage of the process (or GPU).
-        # The previous delta approach (after − before) often yields 0.0 on
-        # CPU because RSS doesn't change within a single inference call.
-        memory_mb = self._get_memory_mb()
+    def _predict_batch_raw(
+        self, texts: list[str], max_new_tokens: int, inference_params: dict | None = None,
+    ) -> tuple[list[tuple[str, int]], int]:
+        """Executor-side half of predict_batch.
+
+        Returns:
+            Tuple of (per-prompt (generated_text, token_count), elapsed_ns).
+        """
+        self._ensure_loaded()
 
+        start = time.perf_counter_ns()
+        with torch.inference_mode():
+            outputs = self._run_batch_inference(texts, max_new_tokens, inference_params)
+        return outputs, time.perf_counter_ns() - start
+
+    def _build_result(
+        self, output_text: str, token_count: int, elapsed_ns: int, memory_mb: float,
+    ) -> InferenceResult:
         return InferenceResult(
             output=output_text,
-            latency_ms=latency_ms,
+            latency_ms=elapsed_ns / 1e6,
             tokens_generated=token_count,
             memory_mb=memory_mb,
-            tokens_per_sec=tokens_per_sec,
         )
 
+    def predict(
+        self, text: str, max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> InferenceResult:
+        """Run inference with full instrumentation.
+
+        Measures latency, memory, and throughput automatically.
+        """
+        output_text, token_count, elapsed_ns = self._predict_raw(
+            text, max_new_tokens, inference_params,
+        )
+        # Report absolute memory usage of the process (or GPU).
+        # The previous delta approach (after − before) often yields 0.0 on
+        # CPU because RSS doesn't change within a single inference call.
+        return self._build_result(output_text, token_count, elapsed_ns, self._get_memory_mb())
+
+    def predict_batch(
+        self, texts: list[str], max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> list[InferenceResult]:
+        """Run inference over a batch of prompts with full instrumentation.
+
+        Every result reports the latency of the whole batch, since that is
+        how long each caller waited for its output.
+        """
+        outputs, elapsed_ns = self._predict_batch_raw(texts, max_new_tokens, inference_params)
+        memory_mb = self._get_memory_mb()
+        return [
+            self._build_result(output_text, token_count, elapsed_ns, memory_mb)
+            for output_text, token_count in outputs
+        ]
+
+    async def apredict_batch(
+        self, texts: list[str], max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> list[InferenceResult]:
+        """Run :meth:`predict_batch` on this server's dedicated inference thread.
+
+        Only the model call occupies the executor; the memory sample and
+        result assembly happen back on the event loop.
+        """
+        loop = asyncio.get_event_loop()
+        outputs, elapsed_ns = await loop.run_in_executor(
+            self._executor, self._predict_batch_raw, texts, max_new_tokens, inference_params,
+        )
+        memory_mb = self._get_memory_mb()
+        return [
+            self._build_result(output_text, token_count, elapsed_ns, memory_mb)
+            for output_text, token_count in outputs
+        ]
+
     def get_model_info(self) -> ModelInfo:
-        """Return metadata about the loaded model."""
+        """Return metadata about the loaded model.
+
+        The result is cached until ``self.model`` is replaced, since the
+        parameter walk below is O(#parameters).
+        """
+        if self._model_info is not None and self._model_info_source is self.model:
+            return self._model_info
+
         param_count = 0
         model_size = 0.0
         dtype_str = "float32"
 
         if self.model is not None and hasattr(self.model, "parameters"):
             params = list(self.model.parameters())
+            # Dynamically quantized Linear layers keep their weight and bias
+            # packed rather than as nn.Parameters; count those too.
+            for module in self.model.modules():
+                if isinstance(module, DynamicQuantizedLinear):
+                    params.append(module.weight())
+                    if module.bias() is not None:
+                        params.append(module.bias())
             param_count = sum(p.numel() for p in params)
             model_size = sum(p.nelement() * p.element_size() for p in params) / (1024 * 1024)
             if params:
                 dtype_str = str(params[0].dtype).replace("torch.", "")
 
-        return ModelInfo(
+        info = ModelInfo(
             name=self.model_name,
             optimization_mode=self.optimization_mode,
             parameter_count=param_count,
@@ -127,17 +301,34 @@ class BaseModelServer(ABC):
             device=self.device,
             dtype=dtype_str,
         )
+        if self.model is not None:
+            self._model_info = info
+            self._model_info_source = self.model
+        return info
 
     def _get_memory_mb(self) -> float:
         """Get current memory usage in MB."""
+        global _last_mem_sample
+
         if self.device == "cuda" and torch.cuda.is_available():
             return torch.cuda.max_memory_allocated() / (1024 * 1024)
-        process = psutil.Process()
-        return process.memory_info().rss / (1024 * 1024)
 
-    def warmup(self, num_runs: int = 3) -> None:
+        now = time.monotonic()
+        sampled_at, rss_mb = _last_mem_sample
+        if now - sampled_at < MEMORY_SAMPLE_TTL_S:
+            return rss_mb
+
+        process = BaseModelServer._process
+        # Re-create after fork so workers report their own RSS.
+        if process is None or process.pid != os.getpid():
+            process = BaseModelServer._process = psutil.Process()
+        rss_mb = process.memory_info().rss / (1024 * 1024)
+        _last_mem_sample = (now, rss_mb)
+        return rss_mb
+
+    def warmup(self, num_runs: int = 3, max_new_tokens: int = 10) -> None:
         """Warm up the model with dummy inference calls."""
         logger.info("Warming up %s server with %d runs", self.optimization_mode, num_runs)
         for _ in range(num_runs):
-            self.predict("Hello world", max_new_tokens=10)
+            self.predict("Hello world", max_new_tokens=max_new_tokens)
         logger.info("Warmup complete for %s", self.optimization_mode)
@@ -1,33 +1,164 @@
 """ONNX Runtime inference server.
 
-Exports the model to ONNX and runs token-by-token generation through
-``onnxruntime``.  If the export or ORT session fails (common with newer
+Exports the model to ONNX with ``past_key_values`` inputs and ``present``
+outputs, and runs token-by-token generation through ``onnxruntime``: the
+prompt is run once (prefill) and each later step feeds only the newest
+token plus the cached keys/values (decode).  If the export or ORT session fails (common with newer
 transformers due to DynamicCache / opset issues), the server falls back
 to standard PyTorch inference so the mode never returns a 500.
 """
 
 from __future__ import annotations
 
+import inspect
 import logging
+import os
 from pathlib import Path
 
 import numpy as np
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
+try:
+    from transformers import DynamicCache
+except ImportError:  # transformers < 4.36 passes the cache as tuples
+    DynamicCache = None
 
-from .base_server import BaseModelServer
+from ._loader import load_causal_lm, load_tokenizer
+from ._sampling import sample_next
+from .base_server import BaseModelServer, generation_params
 
 logger = logging.getLogger(__name__)
 
 OPTIMIZED_DIR = Path(__file__).resolve().parent.parent.parent / "models" / "optimized"
 
+# 17 is the first opset with a single LayerNormalization op, which ORT's
+# optimizer can fuse instead of matching the decomposed mean/var pattern.
+ONNX_OPSET = 17
+
+PAST_PREFIX = "past_key_values."
+PRESENT_PREFIX = "present."
+
+
+def onnx_model_path(model_name: str, output_dir: Path = OPTIMIZED_DIR) -> Path:
+    """Where the KV-cache export of ``model_name`` lives.
+
+    The opset is part of the name so bumping it never loads a stale export.
+    """
+    return output_dir / f"{model_name.replace('/', '_')}_kv_opset{ONNX_OPSET}.onnx"
+
+
+def int8_model_path(onnx_path: Path) -> Path:
+    """Where ``export_onnx.py`` writes the INT8-quantized ``onnx_path``."""
+    return onnx_path.with_name(onnx_path.stem + "_int8.onnx")
+
+
+def optimized_model_path(onnx_path: Path) -> Path:
+    """Where ORT caches its optimized version of ``onnx_path``."""
+    return onnx_path.with_suffix(".opt.onnx")
+
+
+class _CausalLMWithPast(torch.nn.Module):
+    """Flattens the KV cache into plain tensors so it can cross the ONNX
+    boundary as ``past_key_values.{layer}.key/value`` inputs and
+    ``present.{layer}.key/value`` outputs."""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, *past):
+        past_key_values = tuple(
+            (past[i], past[i + 1]) for i in range(0, len(past), 2)
+        )
+        if DynamicCache is not None:
+            past_key_values = DynamicCache(past_key_values)
+
+        out = self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            past_key_values=past_key_values,
+            use_cache=True,
+            return_dict=True,
+        )
+
+        present = out.past_key_values
+        if hasattr(present, "layers"):
+            present = [(layer.keys, layer.values) for layer in present.layers]
+        elif hasattr(present, "key_cache"):
+            present = zip(present.key_cache, present.value_cache)
+        return (out.logits, *(t for kv in present for t in kv))
+
+
+def export_with_past(model: torch.nn.Module, onnx_path: Path) -> None:
+    """Export a causal LM to ONNX with its KV cache as explicit I/O.
+
+    A single graph serves both phases: prefill passes zero-length past
+    tensors, decode passes the previous step's ``present`` outputs.
+    """
+    config = model.config
+    num_layers = config.n_layer
+    num_heads = config.n_head
+    head_dim = config.n_embd // num_heads
+
+    past_names, present_names = [], []
+    for layer in range(num_layers):
+        for kind in ("key", "value"):
+            past_names.append(f"{PAST_PREFIX}{layer}.{kind}")
+            present_names.append(f"{PRESENT_PREFIX}{layer}.{kind}")
+
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "total_sequence"},
+        "logits": {0: "batch", 1: "sequence"},
+    }
+    for name in past_names:
+        dynamic_axes[name] = {0: "batch", 2: "past_sequence"}
+    for name in present_names:
+        dynamic_axes[name] = {0: "batch", 2: "total_sequence"}
+
+    # Trace a decode-shaped call (non-empty past) so no sequence length
+    # gets baked into the graph as a constant.  Ids and mask are int32:
+    # the vocab fits easily, and the id/mask inputs and their Gather are
+    # half the width of int64.
+    past_len = 2
+    dummy_ids = torch.zeros((1, 1), dtype=torch.int32)
+    dummy_mask = torch.ones((1, past_len + 1), dtype=torch.int32)
+    dummy_past = [
+        torch.zeros((1, num_heads, past_len, head_dim)) for _ in past_names
+    ]
+
+    # Newer torch defaults to the dynamo exporter, which rejects
+    # ``dynamic_axes``; keep the TorchScript exporter where there's a choice.
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    torch.onnx.export(
+        _CausalLMWithPast(model).eval(),
+        (dummy_ids, dummy_mask, *dummy_past),
+        str(onnx_path),
+        input_names=["input_ids", "attention_mask", *past_names],
+        output_names=["logits", *present_names],
+        dynamic_axes=dynamic_axes,
+        opset_version=ONNX_OPSET,
+        do_constant_folding=True,
+        **export_kwargs,
+    )
+
 
 class ONNXServer(BaseModelServer):
     """ONNX Runtime inference server with automatic fallback."""
 
-    def __init__(self, model_name: str = "gpt2", device: str | None = None):
-        super().__init__(model_name, optimization_mode="onnx", device="cpu")
+    def __init__(
+        self, model_name: str = "gpt2", device: str | None = None, revision: str | None = None,
+    ):
+        super().__init__(
+            model_name, optimization_mode="onnx", device="cpu", revision=revision,
+        )
         self._ort_session = None
+        self._past_names: list[str] = []
+        self._past_shape: tuple[int, int] = (0, 0)  # (num_heads, head_dim)
+        self._id_dtype = np.int64  # what the export expects for ids/mask
         self._use_ort = False  # True only when export + session load succeed
 
     # ------------------------------------------------------------------
@@ -35,18 +166,18 @@ class ONNXServer(BaseModelServer):
     # ------------------------------------------------------------------
     def load_model(self) -> None:
         logger.info("Loading model for ONNX mode: %s", self.model_name)
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.tokenizer = load_tokenizer(self.model_name, revision=self.revision)
 
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
 
         # Always load a PyTorch model (used as fallback *and* for
-        # get_model_info()).
-        self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
-        self.model.eval()
+        # get_model_info()).  Only read here, so the process-wide
+        # instance is shared rather than copied.
+        self.model = load_causal_lm(self.model_name, revision=self.revision)
 
         # Try the ONNX path — export → load session
-        onnx_path = OPTIMIZED_DIR / f"{self.model_name.replace('/', '_')}.onnx"
+        onnx_path = onnx_model_path(self.model_name)
         try:
             if not onnx_path.exists():
                 self._export_to_onnx(onnx_path)
@@ -59,41 +190,22 @@ class ONNXServer(BaseModelServer):
             )
             self._use_ort = False
             # Clean up a half-written export so the next restart retries
-            if onnx_path.exists():
-                onnx_path.unlink(missing_ok=True)
+            for path in (onnx_path, int8_model_path(onnx_path)):
+                path.unlink(missing_ok=True)
+                optimized_model_path(path).unlink(missing_ok=True)
 
     # ------------------------------------------------------------------
     # ONNX export
     # ------------------------------------------------------------------
     def _export_to_onnx(self, onnx_path: Path) -> None:
-        """Export the PyTorch model to ONNX format.
+        """Export the PyTorch model to ONNX with KV-cache inputs/outputs.
 
-        Disables ``use_cache`` so the tracer never enters DynamicCache
-        code paths (avoids "'Tensor' has no attribute 'get_seq_length'").
+        Traces the already-loaded ``self.model``: the export wrapper passes
+        ``use_cache`` per call, so the live model's config is never touched
+        and no second copy of the weights is needed.
         """
         logger.info("Exporting model to ONNX at %s …", onnx_path)
-        export_model = AutoModelForCausalLM.from_pretrained(self.model_name)
-        export_model.eval()
-        export_model.config.use_cache = False
-
-        dummy = self.tokenizer("Hello world", return_tensors="pt")
-
-        OPTIMIZED_DIR.mkdir(parents=True, exist_ok=True)
-
-        torch.onnx.export(
-            export_model,
-            (dummy["input_ids"], dummy["attention_mask"]),
-            str(onnx_path),
-            input_names=["input_ids", "attention_mask"],
-            output_names=["logits"],
-            dynamic_axes={
-                "input_ids": {0: "batch", 1: "sequence"},
-                "attention_mask": {0: "batch", 1: "sequence"},
-                "logits": {0: "batch", 1: "sequence"},
-            },
-            opset_version=14,
-            do_constant_folding=True,
-        )
+        export_with_past(self.model, onnx_path)
         logger.info("ONNX export complete: %s", onnx_path)
 
     # ------------------------------------------------------------------
@@ -106,98 +218,193 @@ class ONNXServer(BaseModelServer):
         if self.device == "cuda":
             providers.insert(0, "CUDAExecutionProvider")
 
+        # Prefer the INT8 variant from ``export_onnx.py`` when there is one.
+        if int8_model_path(onnx_path).exists():
+            onnx_path = int8_model_path(onnx_path)
+
         opts = ort.SessionOptions()
-        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-        opts.intra_op_num_threads = 4
+        # The first load optimizes the graph and saves the result next to
+        # the export; later loads start from that file and skip the passes.
+        # ORT_ENABLE_ALL output is tuned to this machine, which is fine for
+        # a cache that lives beside the export it was built from.  A cache
+        # older than its source is from a previous export and is rebuilt.
+        opt_path = optimized_model_path(onnx_path)
+        if opt_path.exists() and opt_path.stat().st_mtime >= onnx_path.stat().st_mtime:
+            model_path = opt_path
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            model_path = onnx_path
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            opts.optimized_model_filepath = str(opt_path)
+        # Default to torch's intra-op pool size, which the app already sizes
+        # to this server's share of the cores; ORT_INTRA_THREADS overrides.
+        opts.intra_op_num_threads = int(
+            os.environ.get("ORT_INTRA_THREADS", torch.get_num_threads()),
+        )
+        # One token per step leaves no independent branches to run in
+        # parallel, so ORT_PARALLEL would only add scheduling overhead.
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Reuse the previous run's allocation plan for same-shaped inputs,
+        # and pre-pack constant weights into the kernels' preferred layout.
+        opts.enable_cpu_mem_arena = True
+        opts.enable_mem_pattern = True
+        opts.add_session_config_entry("session.disable_prepacking", "0")
 
         self._ort_session = ort.InferenceSession(
-            str(onnx_path), opts, providers=providers,
+            str(model_path), opts, providers=providers,
+        )
+
+        past_inputs = [
+            i for i in self._ort_session.get_inputs() if i.name.startswith(PAST_PREFIX)
+        ]
+        if not past_inputs:
+            raise RuntimeError(f"{model_path} has no {PAST_PREFIX}* inputs")
+        self._past_names = [i.name for i in past_inputs]
+        # Past inputs are [batch, num_heads, past_sequence, head_dim].
+        _, num_heads, _, head_dim = past_inputs[0].shape
+        self._past_shape = (num_heads, head_dim)
+        # Exports made before the switch to int32 still take int64.
+        ids_type = next(
+            i.type for i in self._ort_session.get_inputs() if i.name == "input_ids"
         )
-        logger.info("ORT session loaded with providers: %s", providers)
+        self._id_dtype = np.int32 if ids_type == "tensor(int32)" else np.int64
+        logger.info("ORT session loaded from %s with providers: %s", model_path.name, providers)
 
     # ------------------------------------------------------------------
     # Forward helpers
     # ------------------------------------------------------------------
     def _onnx_forward(
-        self, input_ids: np.ndarray, attention_mask: np.ndarray,
-    ) -> np.ndarray:
-        """Single forward pass through ONNX Runtime → logits."""
-        return self._ort_session.run(
-            None,
-            {"input_ids": input_ids, "attention_mask": attention_mask},
-        )[0]
+        self,
+        binding,
+        input_ids: np.ndarray,
+        attention_mask: np.ndarray,
+        past: list,
+    ) -> tuple[np.ndarray, list]:
+        """Single forward pass through ONNX Runtime → (last-token logits, present).
+
+        ``past`` and the returned ``present`` stay ORT-owned ``OrtValue``s,
+        so the cache is handed from one step to the next without ever
+        being copied out to numpy.  The logits row is a view into a fresh
+        array that nothing else references, so callers may use it as-is.
+        """
+        binding.bind_cpu_input("input_ids", input_ids)
+        binding.bind_cpu_input("attention_mask", attention_mask)
+        for name, value in zip(self._past_names, past):
+            binding.bind_ortvalue_input(name, value)
+        for output in self._ort_session.get_outputs():
+            binding.bind_output(output.name)
+
+        self._ort_session.run_with_iobinding(binding)
+        outputs = binding.get_outputs()
+        return outputs[0].numpy()[0, -1, :], outputs[1:]
 
     # ------------------------------------------------------------------
     # Inference
     # ------------------------------------------------------------------
-    @torch.no_grad()
-    def _run_inference(self, text: str, max_new_tokens: int = 50) -> tuple[str, int]:
+    @torch.inference_mode()
+    def _run_inference(
+        self, text: str, max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> tuple[str, int]:
         if self._use_ort:
-            return self._run_ort_inference(text, max_new_tokens)
-        return self._run_pytorch_fallback(text, max_new_tokens)
+            return self._run_ort_inference(text, max_new_tokens, inference_params)
+        return self._run_pytorch_fallback(text, max_new_tokens, inference_params)
 
     # ---- ORT path (token-by-token with numpy + sampling) ----
-    def _run_ort_inference(self, text: str, max_new_tokens: int) -> tuple[str, int]:
+    def _run_ort_inference(
+        self, text: str, max_new_tokens: int, inference_params: dict | None = None,
+    ) -> tuple[str, int]:
+        import onnxruntime as ort
+
         inputs = self.tokenizer(
             text, return_tensors="np", truncation=True, max_length=512,
         )
-        input_ids = inputs["input_ids"]
-        attention_mask = inputs["attention_mask"]
-        input_len = input_ids.shape[1]
+        input_len = inputs["input_ids"].shape[1]
 
-        temperature = 0.8
-        top_k = 50
+        # Sized once for the whole generation: each step writes its token
+        # in place and binds a view, instead of concatenating new arrays.
+        total_len = input_len + max_new_tokens
+        ids_buf = np.empty((1, total_len), dtype=self._id_dtype)
+        ids_buf[:, :input_len] = inputs["input_ids"]
+        mask_buf = np.ones((1, total_len), dtype=self._id_dtype)
+        mask_buf[:, :input_len] = inputs["attention_mask"]
+
+        params = generation_params(inference_params)
+        greedy = not params["do_sample"]
+        temperature = params.get("temperature", 1.0)
+        top_k = params.get("top_k", 50)
         ngram_size = 3
         generated: list[int] = []
+        # Ids the repetition penalty applies to, and how many there are.
+        seen = np.zeros(self.model.config.vocab_size, dtype=bool)
+        num_penalized = 0
+        # (ngram_size - 1)-token prefix -> tokens that already followed it.
+        banned: dict[tuple[int, ...], list[int]] = {}
+
+        # Prefill runs the whole prompt against an empty cache.
+        num_heads, head_dim = self._past_shape
+        empty = np.zeros((1, num_heads, 0, head_dim), dtype=np.float32)
+        past = [ort.OrtValue.ortvalue_from_numpy(empty) for _ in self._past_names]
+        binding = self._ort_session.io_binding()
+        step_start, cur_len = 0, input_len
 
         for _ in range(max_new_tokens):
-            logits = self._onnx_forward(input_ids, attention_mask)
-            next_logits = logits[0, -1, :].copy()
+            next_logits, past = self._onnx_forward(
+                binding, ids_buf[:, step_start:cur_len], mask_buf[:, :cur_len], past,
+            )
+            blocked = banned.get(tuple(generated[-(ngram_size - 1):])) if banned else None
+
+            # Both penalties below only ever lower a logit, so the top_k
+            # after them lies within the raw top (top_k + #penalized ids).
+            # Select those once and penalize only the candidates, rather
+            # than copying and rewriting the whole vocab-sized row.
+            num_candidates = min(
+                top_k + num_penalized + (len(blocked) if blocked else 0),
+                next_logits.shape[0],
+            )
+            candidates = np.argpartition(next_logits, -num_candidates)[-num_candidates:]
+            cand_logits = next_logits[candidates]
 
             # Repetition penalty (1.2×)
-            for tid in set(generated):
-                s = next_logits[tid]
-                next_logits[tid] = s / 1.2 if s > 0 else s * 1.2
+            if num_penalized:
+                hit = seen[candidates]
+                vals = cand_logits[hit]
+                cand_logits[hit] = np.where(vals > 0, vals / 1.2, vals * 1.2)
 
             # N-gram blocking
-            if len(generated) >= ngram_size - 1:
-                tail = generated[-(ngram_size - 1):]
-                for i in range(len(generated) - ngram_size + 1):
-                    if generated[i : i + ngram_size - 1] == tail:
-                        next_logits[generated[i + ngram_size - 1]] = -float("inf")
-
-            # Temperature scaling
-            next_logits = next_logits / temperature
+            if blocked:
+                cand_logits[np.isin(candidates, blocked)] = -np.inf
 
-            # Top-k filtering: keep only the top_k highest logits
-            top_k_indices = np.argpartition(next_logits, -top_k)[-top_k:]
-            top_k_logits = next_logits[top_k_indices]
-
-            # Softmax over top-k
-            top_k_logits -= top_k_logits.max()  # numerical stability
-            probs = np.exp(top_k_logits)
-            probs /= probs.sum()
-
-            # Sample from distribution
-            chosen_idx = np.random.choice(len(top_k_indices), p=probs)
-            next_token = int(top_k_indices[chosen_idx])
+            if greedy:
+                next_token = int(candidates[np.argmax(cand_logits)])
+            else:
+                # Top-k, temperature, softmax and the draw in one pass
+                next_token = int(candidates[sample_next(cand_logits, top_k, temperature)])
 
             if next_token == self.tokenizer.eos_token_id:
                 break
 
             generated.append(next_token)
-            nid = np.array([[next_token]], dtype=input_ids.dtype)
-            input_ids = np.concatenate([input_ids, nid], axis=1)
-            attention_mask = np.concatenate(
-                [attention_mask, np.ones((1, 1), dtype=attention_mask.dtype)],
-                axis=1,
-            )
-
-        full_text = self.tokenizer.decode(input_ids[0], skip_special_tokens=True)
-        return full_text, input_ids.shape[1] - input_len
+            if not seen[next_token]:
+                seen[next_token] = True
+                num_penalized += 1
+            if len(generated) >= ngram_size:
+                prefix = tuple(generated[-ngram_size:-1])
+                banned.setdefault(prefix, []).append(next_token)
+            # Decode: only the new token goes in; the mask still spans
+            # the cached positions plus this one.
+            ids_buf[0, cur_len] = next_token
+            step_start, cur_len = cur_len, cur_len + 1
+
+        # Prompt ids come from encoding whole text, so decoding the two
+        # halves separately never splits a character.
+        full_text = self._decode_prompt(ids_buf[0, :input_len].tolist())
+        full_text += self.tokenizer.decode(generated, skip_special_tokens=True)
+        return full_text, len(generated)
 
     # ---- PyTorch fallback ----
-    def _run_pytorch_fallback(self, text: str, max_new_tokens: int) -> tuple[str, int]:
+    def _run_pytorch_fallback(
+        self, text: str, max_new_tokens: int, inference_params: dict | None = None,
+    ) -> tuple[str, int]:
         inputs = self.tokenizer(
             text, return_tensors="pt", truncation=True, max_length=512,
         )
@@ -206,10 +413,7 @@ class ONNXServer(BaseModelServer):
         outputs = self.model.generate(
             **inputs,
             max_new_tokens=max_new_tokens,
-            do_sample=True,
-            temperature=0.8,
-            top_p=0.9,
-            top_k=50,
+            **generation_params(inference_params),
             pad_token_id=self.tokenizer.pad_token_id,
             repetition_penalty=1.2,
             no_repeat_ngram_size=3,
@@ -2,31 +2,77 @@
 
 from __future__ import annotations
 
+import copy
 import logging
+import os
 
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 
-from .base_server import BaseModelServer
+from ._loader import load_causal_lm, load_tokenizer
+from .base_server import BaseModelServer, generation_params
 
 logger = logging.getLogger(__name__)
 
+# Opt-in: baseline is the eager reference every speedup is measured
+# against, and the torchscript mode already covers torch.compile.
+COMPILE_BASELINE = os.environ.get("ML_BENCH_COMPILE", "0") == "1"
+
 
 class PyTorchServer(BaseModelServer):
-    """Baseline PyTorch FP32 model server using Hugging Face transformers."""
+    """Baseline PyTorch FP32 model server using Hugging Face transformers.
+
+    Pass ``dtype=torch.float16`` or ``torch.bfloat16`` on a GPU to halve
+    the bytes each decode step reads; the default keeps FP32 weights.
+    """
 
-    def __init__(self, model_name: str = "gpt2", device: str | None = None):
-        super().__init__(model_name, optimization_mode="baseline", device=device)
+    def __init__(
+        self,
+        model_name: str = "gpt2",
+        device: str | None = None,
+        revision: str | None = None,
+        dtype: torch.dtype | None = None,
+    ):
+        super().__init__(
+            model_name, optimization_mode="baseline", device=device, revision=revision,
+        )
+        self.dtype = dtype
 
-    def load_model(self) -> None:
+    def load_model(self, base_model: torch.nn.Module | None = None) -> None:
+        """Load the tokenizer and model.
+
+        Args:
+            base_model: Already-loaded model to serve instead of loading
+                ``model_name``, e.g. a small randomly initialised one.
+        """
         logger.info("Loading baseline PyTorch model: %s", self.model_name)
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
-        self.model.to(self.device)
+        self.tokenizer = load_tokenizer(self.model_name, revision=self.revision)
+        # The cached model is shared with other servers; moving it to
+        # another device or dtype, or compiling its forward, needs a
+        # private copy.
+        private = COMPILE_BASELINE or self.device != "cpu" or self.dtype is not None
+        if base_model is not None:
+            self.model = copy.deepcopy(base_model) if private else base_model
+        else:
+            self.model = load_causal_lm(
+                self.model_name, revision=self.revision, private=private,
+            )
+        self.model.to(device=self.device, dtype=self.dtype)
         self.model.eval()
 
+        if COMPILE_BASELINE and hasattr(torch, "compile"):
+            # Compile forward() rather than the module: generate() calls
+            # self.forward, which would bypass a compiled module wrapper.
+            # warmup() absorbs the first-call compilation cost.
+            logger.info("Compiling baseline forward with torch.compile")
+            self.model.forward = torch.compile(
+                self.model.forward, mode="reduce-overhead", fullgraph=False,
+            )
+
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
+        # Causal LMs continue from the last position, so batched prompts
+        # must be padded on the left to keep every row's tail aligned.
+        self.tokenizer.padding_side = "left"
 
         info = self.get_model_info()
         logger.info(
@@ -34,8 +80,10 @@ class PyTorchServer(BaseModelServer):
             info.parameter_count, info.model_size_mb, info.dtype,
         )
 
-    @torch.no_grad()
-    def _run_inference(self, text: str, max_new_tokens: int = 50) -> tuple[str, int]:
+    @torch.inference_mode()
+    def _run_inference(
+        self, text: str, max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> tuple[str, int]:
         inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
         input_len = inputs["input_ids"].shape[1]
@@ -43,10 +91,10 @@ class PyTorchServer(BaseModelServer):
         outputs = self.model.generate(
             **inputs,
             max_new_tokens=max_new_tokens,
-            do_sample=True,
-            temperature=0.8,
-            top_p=0.9,
-            top_k=50,
+            **generation_params(inference_params),
+            # Explicit rather than config-dependent: without the KV cache
+            # every step re-attends over the whole prefix.
+            use_cache=True,
             pad_token_id=self.tokenizer.pad_token_id,
             repetition_penalty=1.2,
             no_repeat_ngram_size=3,
@@ -57,3 +105,39 @@ class PyTorchServer(BaseModelServer):
         generated_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
         num_new_tokens = len(outputs[0]) - input_len
         return generated_text, num_new_tokens
+
+    @torch.inference_mode()
+    def _run_batch_inference(
+        self, texts: list[str], max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> list[tuple[str, int]]:
+        inputs = self.tokenizer(
+            texts, return_tensors="pt", padding="longest", truncation=True, max_length=512,
+        )
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        input_len = inputs["input_ids"].shape[1]
+
+        # One generate() call for the whole batch so the weight reads are
+        # shared across every prompt instead of repeated per request.
+        outputs = self.model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            **generation_params(inference_params),
+            use_cache=True,
+            pad_token_id=self.tokenizer.eos_token_id,
+            repetition_penalty=1.2,
+            no_repeat_ngram_size=3,
+        )
+
+        results = []
+        eos_id = self.tokenizer.eos_token_id
+        for row in outputs:
+            # Rows that finish early are right-filled with EOS; count new
+            # tokens up to and including the first one, as generate() would
+            # for a single prompt.
+            new_tokens = row[input_len:].tolist()
+            num_new_tokens = (
+                new_tokens.index(eos_id) + 1 if eos_id in new_tokens else len(new_tokens)
+            )
+            generated_text = self.tokenizer.decode(row, skip_special_tokens=True)
+            results.append((generated_text, num_new_tokens))
+        return results
@@ -5,6 +5,10 @@ transformers (DynamicCache, complex outputs), this server skips
 JIT tracing entirely and instead uses torch.compile (PyTorch 2.0+)
 for graph-level optimizations.  Falls back to standard PyTorch if
 torch.compile is unavailable.
+
+Generation reuses one preallocated ``StaticCache`` where transformers
+supports it, so every decode step has the same shapes and runs the same
+compiled graph instead of triggering a recompile as the sequence grows.
 """
 
 from __future__ import annotations
@@ -12,9 +16,14 @@ from __future__ import annotations
 import logging
 
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 
-from .base_server import BaseModelServer
+try:
+    from transformers import StaticCache
+except ImportError:  # transformers < 4.38
+    StaticCache = None
+
+from ._loader import load_causal_lm, load_tokenizer
+from .base_server import BaseModelServer, generation_params
 
 logger = logging.getLogger(__name__)
 
@@ -28,29 +37,39 @@ class TorchScriptServer(BaseModelServer):
     graph-level optimizations without the serialization constraints.
     """
 
-    def __init__(self, model_name: str = "gpt2", device: str | None = None):
-        super().__init__(model_name, optimization_mode="torchscript", device=device)
+    def __init__(
+        self, model_name: str = "gpt2", device: str | None = None, revision: str | None = None,
+    ):
+        super().__init__(
+            model_name, optimization_mode="torchscript", device=device, revision=revision,
+        )
         self._compiled = False
+        self._static_cache = None
 
     def load_model(self) -> None:
         logger.info("Loading model for compiled mode: %s", self.model_name)
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.tokenizer = load_tokenizer(self.model_name, revision=self.revision)
 
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
 
-        self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
+        # Private copy: compiling forward would leak into other servers.
+        self.model = load_causal_lm(self.model_name, revision=self.revision, private=True)
         self.model.to(self.device)
         self.model.eval()
 
-        # Disable KV cache to sidestep DynamicCache issues
-        self.model.config.use_cache = False
+        self._static_cache = self._make_static_cache()
 
-        # Try torch.compile for graph-level optimizations (PyTorch 2.0+)
+        # Try torch.compile for graph-level optimizations (PyTorch 2.0+).
+        # Compile forward rather than the module: generate() calls the
+        # underlying model, so a compiled wrapper module is never used.
+        # Not fullgraph — the mask helpers branch on cache positions.
         if hasattr(torch, "compile"):
             try:
                 logger.info("Applying torch.compile optimization...")
-                self.model = torch.compile(self.model, mode="reduce-overhead")
+                self.model.forward = torch.compile(self.model.forward, mode="max-autotune")
+                # Stop generate() from compiling a second copy of its own.
+                self.model.generation_config.disable_compile = True
                 self._compiled = True
                 logger.info("torch.compile applied successfully")
             except Exception as e:
@@ -59,26 +78,49 @@ class TorchScriptServer(BaseModelServer):
             logger.info("torch.compile not available (PyTorch < 2.0)")
 
         logger.info(
-            "TorchScript/compiled model ready (compiled=%s)", self._compiled,
+            "TorchScript/compiled model ready (compiled=%s, static_cache=%s)",
+            self._compiled, self._static_cache is not None,
         )
 
-    @torch.no_grad()
-    def _run_inference(self, text: str, max_new_tokens: int = 50) -> tuple[str, int]:
+    def _make_static_cache(self):
+        """Preallocate a KV cache spanning the model's full context."""
+        if StaticCache is None or not getattr(self.model, "_supports_static_cache", True):
+            return None
+        try:
+            return StaticCache(
+                config=self.model.config,
+                max_batch_size=1,
+                max_cache_len=self.model.config.n_positions,
+                device=self.device,
+                dtype=self.model.dtype,
+            )
+        except Exception as e:
+            logger.warning("StaticCache unavailable: %s — using the default cache", e)
+            return None
+
+    @torch.inference_mode()
+    def _run_inference(
+        self, text: str, max_new_tokens: int = 50, inference_params: dict | None = None,
+    ) -> tuple[str, int]:
         inputs = self.tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
         input_len = inputs["input_ids"].shape[1]
 
+        cache_kwargs = {}
+        if self._static_cache is not None:
+            # Requests on this server run one at a time on its executor.
+            self._static_cache.reset()
+            cache_kwargs["past_key_values"] = self._static_cache
+
         outputs = self.model.generate(
             **inputs,
             max_new_tokens=max_new_tokens,
-            do_sample=True,
-            temperature=0.8,
-            top_p=0.9,
-            top_k=50,
-            use_cache=False,
+            **generation_params(inference_params),
+            use_cache=True,
             pad_token_id=self.tokenizer.pad_token_id,
             repetition_penalty=1.2,
             no_repeat_ngram_size=3,
+            **cache_kwargs,
         )
 
         # Decode the FULL sequence (input + generated) so the result
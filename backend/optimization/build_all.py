@@ -0,0 +1,52 @@
+"""Script to build every optimized artifact in parallel.
+
+The ONNX export, torch.export + AOTInductor compile and INT8
+quantization each load the model and are CPU-bound, but share no state,
+so they run in separate processes instead of one after another.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .compile import compile_model
+from .export_onnx import export_to_onnx
+from .quantize import quantize_model
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OPTIMIZED_DIR = Path(__file__).resolve().parent.parent.parent / "models" / "optimized"
+
+BUILDERS = (export_to_onnx, compile_model, quantize_model)
+
+
+def build_all(model_name: str = "gpt2", output_dir: Path = OPTIMIZED_DIR) -> list[Path]:
+    """Run every optimization script for ``model_name`` concurrently.
+
+    Args:
+        model_name: HF model identifier.
+        output_dir: Directory to save the artifacts.
+
+    Returns:
+        Paths of the saved artifacts, in ``BUILDERS`` order.
+    """
+    with ProcessPoolExecutor(max_workers=len(BUILDERS)) as ex:
+        # Submit the functions themselves: lambdas can't be pickled over
+        # to the worker processes.
+        futures = [ex.submit(build, model_name, output_dir) for build in BUILDERS]
+        paths = [future.result() for future in futures]
+
+    for path in paths:
+        logger.info("Built %s", path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build all optimized artifacts")
+    parser.add_argument("--model", default="gpt2", help="Model name")
+    args = parser.parse_args()
+    build_all(args.model)
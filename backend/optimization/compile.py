@@ -1,4 +1,4 @@
-"""Script to compile PyTorch models using TorchScript."""
+"""Script to compile PyTorch models ahead of time with AOTInductor."""
 
 from __future__ import annotations
 
@@ -7,6 +7,7 @@ import logging
 from pathlib import Path
 
 import torch
+from torch.export import Dim, export
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
 logging.basicConfig(level=logging.INFO)
@@ -15,15 +16,33 @@ logger = logging.getLogger(__name__)
 OPTIMIZED_DIR = Path(__file__).resolve().parent.parent.parent / "models" / "optimized"
 
 
+class _LogitsOnly(torch.nn.Module):
+    """Plain tensors in and out, with no KV cache objects for export to trace."""
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(
+            input_ids=input_ids, attention_mask=attention_mask, use_cache=False,
+        ).logits
+
+
 def compile_model(model_name: str = "gpt2", output_dir: Path = OPTIMIZED_DIR) -> Path:
-    """Compile a model to TorchScript using tracing.
+    """Compile a model to a native AOTInductor artifact via ``torch.export``.
+
+    ``torch.jit.trace`` cannot follow modern transformers' cache objects
+    and produced modules that failed at runtime; ``torch.export`` captures
+    the graph with a dynamic sequence length instead.
 
     Args:
         model_name: HF model identifier.
         output_dir: Directory to save compiled model.
 
     Returns:
-        Path to the saved TorchScript model.
+        Path to the compiled artifact: a ``.pt2`` package, or a ``.so`` on
+        torch < 2.6.
     """
     logger.info("Loading model: %s", model_name)
     model = AutoModelForCausalLM.from_pretrained(model_name)
@@ -31,28 +50,46 @@ def compile_model(model_name: str = "gpt2", output_dir: Path = OPTIMIZED_DIR) ->
 
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     dummy = tokenizer("Hello world", return_tensors="pt")
+    example = (dummy["input_ids"], dummy["attention_mask"])
+
+    sequence = Dim("sequence", min=2, max=model.config.n_positions)
+    dynamic_shapes = {"input_ids": {1: sequence}, "attention_mask": {1: sequence}}
 
-    logger.info("Tracing model with torch.jit.trace...")
+    logger.info("Exporting model with torch.export...")
     with torch.no_grad():
-        traced = torch.jit.trace(
-            model,
-            example_kwarg_inputs={
-                "input_ids": dummy["input_ids"],
-                "attention_mask": dummy["attention_mask"],
-            },
-            strict=False,
-        )
+        exported = export(_LogitsOnly(model).eval(), example, dynamic_shapes=dynamic_shapes)
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    save_path = output_dir / f"{model_name.replace('/', '_')}_torchscript.pt"
-    torch.jit.save(traced, str(save_path))
-    logger.info("TorchScript model saved to %s", save_path)
+    stem = f"{model_name.replace('/', '_')}_aot"
+
+    logger.info("Compiling with AOTInductor...")
+    if hasattr(torch._inductor, "aoti_compile_and_package"):
+        save_path = output_dir / f"{stem}.pt2"
+        torch._inductor.aoti_compile_and_package(exported, package_path=str(save_path))
+        compiled = torch._inductor.aoti_load_package(str(save_path))
+    else:  # torch < 2.6
+        from torch._export import aot_compile, aot_load
+
+        save_path = output_dir / f"{stem}.so"
+        aot_compile(
+            exported.module(),
+            example,
+            dynamic_shapes=dynamic_shapes,
+            options={"aot_inductor.output_path": str(save_path)},
+        )
+        compiled = aot_load(str(save_path), "cpu")
+    logger.info("AOT-compiled model saved to %s", save_path)
+
+    # Verify with a quick forward pass
+    with torch.no_grad():
+        logits = compiled(*example)
+    logger.info("Verification: output shape = %s", tuple(logits.shape))
 
     return save_path
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Compile model to TorchScript")
+    parser = argparse.ArgumentParser(description="Compile model ahead of time with AOTInductor")
     parser.add_argument("--model", default="gpt2", help="Model name")
     args = parser.parse_args()
     compile_model(args.model)
@@ -6,9 +6,16 @@ import argparse
 import logging
 from pathlib import Path
 
-import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+from ..models.onnx_server import (
+    PAST_PREFIX,
+    export_with_past,
+    int8_model_path,
+    onnx_model_path,
+    optimized_model_path,
+)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -16,7 +23,10 @@ OPTIMIZED_DIR = Path(__file__).resolve().parent.parent.parent / "models" / "opti
 
 
 def export_to_onnx(model_name: str = "gpt2", output_dir: Path = OPTIMIZED_DIR) -> Path:
-    """Export a Hugging Face model to ONNX format.
+    """Export a Hugging Face model to ONNX format, with KV-cache I/O.
+
+    Also writes an INT8 dynamically-quantized copy, which ``ONNXServer``
+    loads in preference to the FP32 export.
 
     Args:
         model_name: HF model identifier.
@@ -32,35 +42,40 @@ def export_to_onnx(model_name: str = "gpt2", output_dir: Path = OPTIMIZED_DIR) -
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     dummy = tokenizer("Hello world", return_tensors="pt")
 
-    output_dir.mkdir(parents=True, exist_ok=True)
-    save_path = output_dir / f"{model_name.replace('/', '_')}.onnx"
+    save_path = onnx_model_path(model_name, output_dir)
 
     logger.info("Exporting to ONNX at %s", save_path)
-    torch.onnx.export(
-        model,
-        (dummy["input_ids"], dummy["attention_mask"]),
-        str(save_path),
-        input_names=["input_ids", "attention_mask"],
-        output_names=["logits"],
-        dynamic_axes={
-            "input_ids": {0: "batch", 1: "sequence"},
-            "attention_mask": {0: "batch", 1: "sequence"},
-            "logits": {0: "batch", 1: "sequence"},
-        },
-        opset_version=14,
-        do_constant_folding=True,
-    )
+    export_with_past(model, save_path)
     logger.info("ONNX export complete")
 
-    # Verify
+    # Verify: a prefill step against an empty cache
     import onnxruntime as ort
     import numpy as np
 
     session = ort.InferenceSession(str(save_path), providers=["CPUExecutionProvider"])
-    inputs_np = {k: v.numpy() for k, v in dummy.items()}
+    inputs_np = {k: v.numpy().astype(np.int32) for k, v in dummy.items()}
+    for inp in session.get_inputs():
+        if inp.name.startswith(PAST_PREFIX):
+            _, num_heads, _, head_dim = inp.shape
+            inputs_np[inp.name] = np.zeros((1, num_heads, 0, head_dim), dtype=np.float32)
     outputs = session.run(None, inputs_np)
     logger.info("Verification: output shape = %s", outputs[0].shape)
 
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = int8_model_path(save_path)
+    quantize_dynamic(
+        str(save_path),
+        str(int8_path),
+        weight_type=QuantType.QInt8,
+        op_types_to_quantize=["MatMul", "Gemm"],
+    )
+    logger.info("INT8 model saved to %s", int8_path)
+
+    # Drop graph caches the server optimized from a previous export.
+    for path in (save_path, int8_path):
+        optimized_model_path(path).unlink(missing_ok=True)
+
     return save_path
 
 
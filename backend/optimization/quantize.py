@@ -7,9 +7,10 @@ import logging
 from pathlib import Path
 
 import torch
-from torch.quantization import quantize_dynamic
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+from ..models.quantized_server import quantize_int8
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -19,6 +20,9 @@ OPTIMIZED_DIR = Path(__file__).resolve().parent.parent.parent / "models" / "opti
 def quantize_model(model_name: str = "gpt2", output_dir: Path = OPTIMIZED_DIR) -> Path:
     """Quantize a Hugging Face model using dynamic INT8 quantization.
 
+    GPT-2's ``Conv1D`` projections are converted to ``nn.Linear`` first so
+    the quantizer actually matches them.
+
     Args:
         model_name: HF model identifier.
         output_dir: Directory to save quantized model.
@@ -33,13 +37,16 @@ def quantize_model(model_name: str = "gpt2", output_dir: Path = OPTIMIZED_DIR) -
     original_size = sum(p.nelement() * p.element_size() for p in model.parameters())
     logger.info("Original model size: %.2f MB", original_size / (1024 * 1024))
 
-    logger.info("Applying dynamic INT8 quantization to Linear layers...")
-    quantized = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    logger.info("Applying dynamic INT8 quantization to Conv1D projections...")
+    quantized = quantize_int8(model)
 
     output_dir.mkdir(parents=True, exist_ok=True)
     save_path = output_dir / f"{model_name.replace('/', '_')}_int8.pt"
     torch.save(quantized.state_dict(), save_path)
-    logger.info("Quantized model saved to %s", save_path)
+    logger.info(
+        "Quantized model saved to %s (%.2f MB)",
+        save_path, save_path.stat().st_size / (1024 * 1024),
+    )
 
     # Verify with a quick inference
     tokenizer = AutoTokenizer.from_pretrained(model_name)
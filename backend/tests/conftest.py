@@ -1,5 +1,7 @@
 """Shared pytest configuration."""
 
+import copy
+import os
 import sys
 from pathlib import Path
 
@@ -7,3 +9,173 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent.parent
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
+
+import pytest
+
+# Pinned gpt2 commit, so a moved hub branch never invalidates a warm CI
+# cache of ~/.cache/huggingface/hub.  Key that cache on this and the
+# transformers version.
+GPT2_REVISION = os.environ.get("GPT2_REVISION", "e7da7f221d5bf496a48136c0cd264e630fe9fcc8")
+
+
+# Requested by the server fixtures rather than autouse, so tests that
+# never touch a model don't pay for importing torch.
+@pytest.fixture(scope="session")
+def torch_perf():
+    """Pin torch's thread pools and turn autograd off for the session."""
+    import psutil
+    import torch
+
+    # One intra-op thread per physical core: hyperthread siblings share
+    # the vector units the GEMM kernels saturate.  Under pytest-xdist the
+    # cores are split between the worker processes.
+    cores = psutil.cpu_count(logical=False) or torch.get_num_threads()
+    workers = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", "1"))
+    torch.set_num_threads(max(1, cores // workers))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:  # only settable before inter-op work has started
+        pass
+    torch.backends.mkldnn.enabled = True
+    # Grad mode is per thread; this covers calls made from the test thread.
+    with torch.no_grad():
+        yield
+
+
+# Session scope: every module that needs a server reuses the same one, and
+# the servers draw their weights from the process-wide loader cache, so
+# gpt2 is read from disk once per pytest process.
+@pytest.fixture(scope="session")
+def gpt2_base_model():
+    """The FP32 gpt2 weights, loaded once and shared by every server fixture."""
+    from backend.models._loader import load_causal_lm
+
+    return load_causal_lm("gpt2", revision=GPT2_REVISION)
+
+
+@pytest.fixture(scope="session")
+def tiny_base_model():
+    """A randomly initialised 2-layer gpt2 for tests of server glue code.
+
+    It shares gpt2's tokenizer but loads in milliseconds instead of
+    reading ~500 MB of weights.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, GPT2Config
+
+    from backend.models._loader import load_tokenizer
+
+    tokenizer = load_tokenizer("gpt2", revision=GPT2_REVISION)
+    torch.manual_seed(0)
+    config = GPT2Config(n_layer=2, n_head=2, n_embd=32, vocab_size=len(tokenizer))
+    return AutoModelForCausalLM.from_config(config).eval()
+
+
+def _base_model(request):
+    # Servers get the tiny model unless a test asks for real weights with
+    # @pytest.mark.parametrize("<server fixture>", ["real"], indirect=True).
+    if getattr(request, "param", "tiny") == "real":
+        return request.getfixturevalue("gpt2_base_model")
+    return request.getfixturevalue("tiny_base_model")
+
+
+@pytest.fixture
+def assert_uses_kv_cache(monkeypatch):
+    """Return a check that ``server.predict`` decodes with the KV cache.
+
+    With the cache, only the first forward sees the whole prompt and each
+    later step feeds just the newest token; without it every step
+    re-attends over the full prefix.
+    """
+    from backend.models.base_server import GREEDY_PARAMS
+
+    def check(server):
+        step_lengths = []
+        forward = server.model.forward
+
+        def recording_forward(*args, **kwargs):
+            step_lengths.append(kwargs["input_ids"].shape[1])
+            return forward(*args, **kwargs)
+
+        monkeypatch.setattr(server.model, "forward", recording_forward)
+        server.predict("The cat sat on", 4, GREEDY_PARAMS)
+        assert step_lengths[0] > 1
+        assert set(step_lengths[1:]) == {1}
+
+    return check
+
+
+def _warmup(server):
+    # One-token calls are enough to pull kernel selection, allocator
+    # growth and lazy CUDA init out of the first test's timings.
+    server.warmup(num_runs=2, max_new_tokens=1)
+
+
+@pytest.fixture(scope="session")
+def baseline_server(request, torch_perf):
+    """Load the baseline server once for the whole test session."""
+    import torch
+
+    from backend.models.pytorch_server import PyTorchServer
+
+    # Half precision on a GPU; FP32 on CPU, where it has no fast kernels.
+    device, dtype = "cpu", None
+    if torch.cuda.is_available():
+        device = "cuda"
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+
+    server = PyTorchServer(
+        model_name="gpt2", device=device, revision=GPT2_REVISION, dtype=dtype,
+    )
+    server.load_model(base_model=_base_model(request))
+    _warmup(server)
+    return server
+
+
+@pytest.fixture(scope="session")
+def cpu_baseline_server(request, torch_perf):
+    """An eager FP32 baseline server on CPU, whatever hardware is present.
+
+    The reference for comparisons against CPU-only servers, which the
+    GPU half-precision ``baseline_server`` would not be.
+    """
+    from backend.models.pytorch_server import PyTorchServer
+
+    server = PyTorchServer(model_name="gpt2", device="cpu", revision=GPT2_REVISION)
+    server.load_model(base_model=_base_model(request))
+    _warmup(server)
+    return server
+
+
+@pytest.fixture(scope="session")
+def baseline_server_compiled(request, torch_perf):
+    """A baseline server whose forward runs through torch.compile."""
+    import torch
+
+    from backend.models.pytorch_server import PyTorchServer
+
+    if not hasattr(torch, "compile"):
+        pytest.skip("torch.compile needs PyTorch 2.0+")
+
+    server = PyTorchServer(model_name="gpt2", device="cpu", revision=GPT2_REVISION)
+    # Compiling patches forward in place, so compile a copy rather than
+    # the model the eager fixtures share.
+    server.load_model(base_model=copy.deepcopy(_base_model(request)))
+    # Compile forward rather than the module: generate() calls
+    # self.forward, which would bypass a compiled wrapper module.
+    server.model.forward = torch.compile(
+        server.model.forward, mode="reduce-overhead", fullgraph=False,
+    )
+    # Warmup triggers the compiles before any test times the server.
+    _warmup(server)
+    return server
+
+
+@pytest.fixture(scope="session")
+def quantized_server(request, torch_perf):
+    from backend.models.quantized_server import QuantizedServer
+
+    server = QuantizedServer(model_name="gpt2", revision=GPT2_REVISION)
+    server.load_model(base_model=_base_model(request))
+    _warmup(server)
+    return server
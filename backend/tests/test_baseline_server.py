@@ -0,0 +1,73 @@
+"""Tests for the baseline PyTorch model server.
+
+These tests require model downloads and are slower, so they are marked
+slow and skipped by default; run them with ``make test-slow``.
+"""
+
+import pytest
+
+from backend.models.base_server import GREEDY_PARAMS, InferenceResult
+
+pytestmark = [pytest.mark.slow]
+
+# Distinct first tokens, so outputs differ even under greedy decoding.
+PROMPTS = ["Hello world", "The cat sat on", "Machine learning is"]
+
+# Decode steps are serial; two are enough to check the result plumbing.
+MAX_NEW_TOKENS = 2
+
+
+# One padded generate() for every prompt: the tests below assert over
+# slices of it instead of each paying for its own decode.
+@pytest.fixture(scope="session")
+def batched_outputs(baseline_server):
+    results = baseline_server.predict_batch(PROMPTS, MAX_NEW_TOKENS, GREEDY_PARAMS)
+    assert len(results) == len(PROMPTS)
+    return dict(zip(PROMPTS, results))
+
+
+class TestPyTorchServer:
+    def test_predict_returns_result(self, batched_outputs):
+        result = batched_outputs["Hello world"]
+        assert isinstance(result, InferenceResult)
+        assert len(result.output) > 0
+        assert result.latency_ms > 0
+        assert result.tokens_generated > 0
+        assert result.tokens_per_sec > 0
+
+    def test_model_info(self, baseline_server):
+        info = baseline_server.get_model_info()
+        assert info.name == "gpt2"
+        assert info.optimization_mode == "baseline"
+        assert info.parameter_count > 0
+        assert info.model_size_mb > 0
+        assert baseline_server.get_model_info() is info
+
+    @pytest.mark.parametrize("baseline_server", ["real"], indirect=True)
+    def test_different_inputs(self, batched_outputs):
+        outputs = [result.output for result in batched_outputs.values()]
+        assert len(set(outputs)) == len(outputs)
+
+    # Reported per prompt, but every case reads the same batched call.
+    @pytest.mark.parametrize("prompt", PROMPTS)
+    def test_predict_batch(self, batched_outputs, prompt):
+        result = batched_outputs[prompt]
+        assert isinstance(result, InferenceResult)
+        assert result.output.startswith(prompt)
+        assert result.tokens_generated > 0
+
+    def test_greedy_params_are_deterministic(self, baseline_server):
+        r1 = baseline_server.predict("The cat sat on", MAX_NEW_TOKENS, GREEDY_PARAMS)
+        r2 = baseline_server.predict("The cat sat on", MAX_NEW_TOKENS, GREEDY_PARAMS)
+        assert r1.output == r2.output
+
+    def test_compiled_matches_eager(self, cpu_baseline_server, baseline_server_compiled):
+        # Same base model, device and dtype on both sides; only compilation differs.
+        eager = cpu_baseline_server.predict("The cat sat on", MAX_NEW_TOKENS, GREEDY_PARAMS)
+        compiled = baseline_server_compiled.predict(
+            "The cat sat on", MAX_NEW_TOKENS, GREEDY_PARAMS,
+        )
+        assert compiled.output == eager.output
+
+    def test_generate_uses_kv_cache(self, baseline_server, assert_uses_kv_cache):
+        assert_uses_kv_cache(baseline_server)
@@ -0,0 +1,96 @@
+"""Tests for the dynamic batching engine, against a stub model server."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.batching.dynamic_batcher import DynamicBatcher
+
+
+class StubServer:
+    """Echoes each prompt back and records every batched call."""
+
+    def __init__(self, fail_on: str | None = None):
+        self.calls: list[tuple[list[str], int, dict | None]] = []
+        self.fail_on = fail_on
+
+    async def apredict_batch(self, texts, max_new_tokens, inference_params=None):
+        self.calls.append((list(texts), max_new_tokens, inference_params))
+        if self.fail_on in texts:
+            raise RuntimeError(f"failed on {self.fail_on}")
+        return [
+            SimpleNamespace(
+                output=f"{text} -> out",
+                latency_ms=1.0,
+                tokens_per_sec=1.0,
+                memory_mb=1.0,
+                tokens_generated=max_new_tokens,
+            )
+            for text in texts
+        ]
+
+
+def _run(server, requests, max_batch_size=16):
+    """Submit ``(text, max_new_tokens, params)`` requests in one window."""
+
+    async def main():
+        batcher = DynamicBatcher(
+            server, max_batch_size=max_batch_size, max_wait_time_ms=200.0,
+        )
+        await batcher.start()
+        try:
+            return await asyncio.gather(
+                *(batcher.submit(*req) for req in requests), return_exceptions=True,
+            )
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(main())
+
+
+class TestDynamicBatcher:
+    def test_groups_by_tokens_params_and_length(self):
+        server = StubServer()
+        long_text = " ".join(["word"] * 40)
+        results = _run(server, [
+            ("a", 5, None),
+            ("b", 5, None),
+            ("c", 10, None),
+            ("d", 5, {"do_sample": False}),
+            (long_text, 5, None),
+        ])
+
+        assert sorted(texts for texts, _, _ in server.calls) == sorted(
+            [["a", "b"], ["c"], ["d"], [long_text]]
+        )
+        assert [r["batch_size"] for r in results] == [2, 2, 1, 1, 1]
+
+    def test_results_fan_out_to_their_own_request(self):
+        server = StubServer()
+        results = _run(server, [("a", 5, None), ("b", 5, None), ("c", 7, None)])
+
+        assert [r["output"] for r in results] == ["a -> out", "b -> out", "c -> out"]
+        assert [r["tokens_generated"] for r in results] == [5, 5, 7]
+
+    def test_errors_only_reach_the_failing_group(self):
+        server = StubServer(fail_on="b")
+        results = _run(server, [("a", 5, None), ("b", 5, None), ("c", 7, None)])
+
+        for result in results[:2]:
+            assert isinstance(result, RuntimeError)
+        assert results[2]["output"] == "c -> out"
+
+    def test_params_are_passed_through(self):
+        server = StubServer()
+        _run(server, [("a", 5, {"do_sample": False})])
+        assert server.calls == [(["a"], 5, {"do_sample": False})]
+
+
+    @pytest.mark.parametrize("max_batch_size", [1, 2])
+    def test_max_batch_size_caps_each_call(self, max_batch_size):
+        server = StubServer()
+        results = _run(server, [(text, 5, None) for text in "abc"], max_batch_size)
+
+        assert all(len(texts) <= max_batch_size for texts, _, _ in server.calls)
+        assert all(r["batch_size"] <= max_batch_size for r in results)
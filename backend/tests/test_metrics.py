@@ -3,6 +3,7 @@
 import time
 import pytest
 from backend.metrics.collector import MetricsCollector, InferenceMetric
+from backend.metrics.storage import MetricsStorage
 from backend.metrics.analyzer import (
     compute_percentiles,
     estimate_cost_per_million_tokens,
@@ -46,6 +47,24 @@ class TestMetricsCollector:
         assert summary["latency"]["min"] == 100.0
         assert summary["latency"]["max"] == 300.0
 
+    def test_summary_cache_refreshes_on_record(self):
+        def record(latency):
+            self.collector.record(InferenceMetric(
+                optimization_mode="baseline",
+                latency_ms=latency,
+                tokens_per_sec=50.0,
+                memory_mb=500.0,
+                tokens_generated=25,
+            ))
+
+        record(100.0)
+        first = self.collector.get_summary("baseline")
+        assert self.collector.get_summary("baseline") is first
+        record(300.0)
+        second = self.collector.get_summary("baseline")
+        assert second["count"] == 2
+        assert second["latency"]["mean"] == 200.0
+
     def test_max_history_eviction(self):
         collector = MetricsCollector(max_history=5)
         for i in range(10):
@@ -57,6 +76,43 @@ class TestMetricsCollector:
                 tokens_generated=1,
             ))
         assert len(collector.get_all_metrics()) == 5
+        assert collector.count() == 10
+
+    def test_summary_after_eviction(self):
+        collector = MetricsCollector(max_history=3)
+        for i in range(5):
+            collector.record(InferenceMetric(
+                optimization_mode="baseline",
+                latency_ms=float(i),
+                tokens_per_sec=1.0,
+                memory_mb=1.0,
+                tokens_generated=1,
+                timestamp=float(i),
+            ))
+        summary = collector.get_summary("baseline")
+        assert summary["count"] == 3
+        assert summary["latency"]["min"] == 2.0
+        assert summary["latency"]["max"] == 4.0
+        assert summary["throughput"]["requests_per_sec"] == 1.5
+
+    def test_summaries_share_the_history_window(self):
+        collector = MetricsCollector(max_history=4)
+        for i, mode in enumerate(["baseline", "onnx", "baseline", "onnx", "onnx", "onnx"]):
+            collector.record(InferenceMetric(
+                optimization_mode=mode,
+                latency_ms=float(i),
+                tokens_per_sec=1.0,
+                memory_mb=1.0,
+                tokens_generated=1,
+                timestamp=float(i),
+            ))
+        summaries = collector.get_all_summaries()
+        for mode, summary in summaries.items():
+            window = collector.get_metrics_by_mode(mode)
+            assert summary["count"] == len(window)
+            assert summary["latency"]["min"] == min(m.latency_ms for m in window)
+        assert summaries["baseline"]["count"] == 1
+        assert summaries["onnx"]["latency"]["min"] == 3.0
 
     def test_get_recent(self):
         for i in range(5):
@@ -83,6 +139,24 @@ class TestMetricsCollector:
         assert len(self.collector.get_all_metrics()) == 0
 
 
+class TestMetricsStorage:
+    def test_save_and_history(self, tmp_path):
+        storage = MetricsStorage(db_path=tmp_path / "metrics.db")
+        for mode, lat in [("baseline", 100.0), ("onnx", 50.0), ("baseline", 120.0)]:
+            storage.save(InferenceMetric(
+                optimization_mode=mode,
+                latency_ms=lat,
+                tokens_per_sec=10.0,
+                memory_mb=500.0,
+                tokens_generated=5,
+            ))
+        storage.flush()
+        assert storage.get_total_count() == 3
+        history = storage.get_history(mode="baseline")
+        assert [r["latency_ms"] for r in history] == [120.0, 100.0]
+        storage.close()
+
+
 class TestAnalyzer:
     def test_compute_percentiles(self):
         values = list(range(1, 101))  # 1..100
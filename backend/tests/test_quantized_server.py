@@ -0,0 +1,72 @@
+"""Tests for the INT8 quantized model server.
+
+These tests require model downloads and are slower, so they are marked
+slow and skipped by default; run them with ``make test-slow``.
+"""
+
+import statistics
+
+import pytest
+from torch.ao.nn.quantized.dynamic import Linear as DynamicQuantizedLinear
+
+from backend.models.base_server import GREEDY_PARAMS, InferenceResult
+
+pytestmark = [pytest.mark.slow]
+
+# Decode steps are serial; two are enough to check the result plumbing.
+MAX_NEW_TOKENS = 2
+
+# Enough decode steps for the timed runs to measure the projections
+# rather than per-call overhead.
+TIMED_NEW_TOKENS = 16
+
+# Minimum median-latency ratio of baseline over quantized on CPU.
+MIN_SPEEDUP = 1.3
+
+
+def _median_latency_ms(server, prompt: str, runs: int = 3) -> float:
+    server.predict(prompt, TIMED_NEW_TOKENS, GREEDY_PARAMS)  # warm-up
+    return statistics.median(
+        server.predict(prompt, TIMED_NEW_TOKENS, GREEDY_PARAMS).latency_ms
+        for _ in range(runs)
+    )
+
+
+class TestQuantizedServer:
+    def test_predict_returns_result(self, quantized_server):
+        result = quantized_server.predict("Hello world", MAX_NEW_TOKENS)
+        assert isinstance(result, InferenceResult)
+        assert len(result.output) > 0
+        assert result.latency_ms > 0
+
+    def test_model_info(self, quantized_server):
+        info = quantized_server.get_model_info()
+        assert info.optimization_mode == "quantized"
+
+    def test_model_info_counts_packed_weights(self, quantized_server, cpu_baseline_server):
+        # INT8 projections are packed, not nn.Parameters, but still count.
+        info = quantized_server.get_model_info()
+        baseline_info = cpu_baseline_server.get_model_info()
+        assert info.parameter_count == baseline_info.parameter_count
+        assert info.model_size_mb < baseline_info.model_size_mb
+
+    def test_projections_are_int8(self, quantized_server):
+        modules = list(quantized_server.model.modules())
+        assert any(isinstance(m, DynamicQuantizedLinear) for m in modules)
+        # The tied LM head stays FP32.
+        assert not isinstance(quantized_server.model.lm_head, DynamicQuantizedLinear)
+
+    # Real weights: the tiny model is too small for INT8 to pay off.
+    @pytest.mark.timing
+    @pytest.mark.parametrize("cpu_baseline_server", ["real"], indirect=True)
+    @pytest.mark.parametrize("quantized_server", ["real"], indirect=True)
+    @pytest.mark.parametrize("prompt", ["Hello world", "Machine learning is"])
+    def test_quantized_faster_than_baseline(self, cpu_baseline_server, quantized_server, prompt):
+        # Both greedy on CPU, so the only difference is INT8 vs FP32
+        # projections.
+        baseline_ms = _median_latency_ms(cpu_baseline_server, prompt)
+        quantized_ms = _median_latency_ms(quantized_server, prompt)
+        assert baseline_ms / quantized_ms >= MIN_SPEEDUP
+
+    def test_generate_uses_kv_cache(self, quantized_server, assert_uses_kv_cache):
+        assert_uses_kv_cache(quantized_server)
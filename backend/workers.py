@@ -0,0 +1,20 @@
+"""Gunicorn worker classes for serving the FastAPI app."""
+
+from __future__ import annotations
+
+from uvicorn.workers import UvicornWorker
+
+
+class UvloopWorker(UvicornWorker):
+    """UvicornWorker pinned to uvloop + httptools.
+
+    The stock worker only picks them when importable ("auto"); pinning makes
+    a missing dependency fail loudly instead of silently serving from the
+    slower asyncio loop and h11 parser.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "limit_concurrency": 1000,
+    }